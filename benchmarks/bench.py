@@ -0,0 +1,344 @@
+"""Benchmarks of the hot paths of nbsync.
+
+The benchmarks run on synthetic pages and notebooks generated in a
+temporary directory, so that the results are reproducible. The time of a
+benchmark is the best time per call over several repeats, and the peak is
+the peak memory allocated by Python during a single call. The parse cache
+is cleared before each call, except in `sync.parse.cached`, so that the
+pages are parsed as in a cold build.
+
+Usage:
+
+    python benchmarks/bench.py run [-k NAME] [--save FILE] [--execute]
+    python benchmarks/bench.py compare FILE [-k NAME] [--threshold 0.2]
+
+`run --save` stores the results as a baseline, and `compare` runs the
+benchmarks again and exits with status 1 if any of them is slower, or
+uses more memory, than the baseline by more than the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import itertools
+import json
+import platform
+import random
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from dataclasses import asdict, dataclass
+from functools import partial
+from importlib.metadata import version
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import nbformat
+import nbstore.store
+from nbstore import Store
+
+import nbsync.markdown
+from nbsync import Synchronizer
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from nbformat import NotebookNode
+
+    Setup = Callable[[Path], Callable[[], Any]]
+
+# pyright: reportUnknownMemberType=false
+
+BENCHMARKS: dict[str, tuple[Setup, bool]] = {}
+
+
+def benchmark(name: str, *, execute: bool = False) -> Callable[[Setup], Setup]:
+    """Register a setup function that returns the function to measure.
+
+    Benchmarks that execute kernels only run with `--execute`.
+    """
+
+    def decorator(setup: Setup) -> Setup:
+        BENCHMARKS[name] = (setup, execute)
+        return setup
+
+    return decorator
+
+
+def new_page(n: int, url: str = "a.ipynb") -> str:
+    """Return a page with `n` sections of text, a code block, and an image."""
+    sections = [
+        f"## Section {k}\n\n"
+        f"Some text about the figure {k}, with `code` and *emphasis*.\n\n"
+        f"```python title='{k}.py'\nx = {k}\nprint(x)\n```\n\n"
+        f"![Figure {k}]({url}){{#c{k}}}\n"
+        for k in range(n)
+    ]
+    return "\n".join(sections)
+
+
+def new_notebook(n: int, image_bytes: int = 0) -> NotebookNode:
+    """Return an executed notebook with `n` cells.
+
+    Each cell has a stream output, and a PNG output of `image_bytes`
+    random bytes if given.
+    """
+    rng = random.Random(0)  # noqa: S311
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["language_info"] = {"name": "python"}
+
+    for k in range(n):
+        cell = nbformat.v4.new_code_cell(f"# #c{k}\nprint({k})", execution_count=k)
+        cell.outputs.append(
+            nbformat.v4.new_output("stream", name="stdout", text=f"{k}\n"),
+        )
+        if image_bytes:
+            data = base64.b64encode(rng.randbytes(image_bytes)).decode()
+            output = nbformat.v4.new_output(
+                "display_data",
+                data={"image/png": data, "text/plain": "<Figure>"},
+            )
+            cell.outputs.append(output)
+        nb.cells.append(cell)
+
+    return nb
+
+
+def write_notebook(path: Path, nb: NotebookNode) -> Path:
+    nbformat.write(nb, path)
+    return path
+
+
+@benchmark("markdown.parse")
+def markdown_parse(path: Path) -> Callable[[], Any]:
+    text = new_page(2000)
+    return lambda: list(nbsync.markdown.parse(text))
+
+
+@benchmark("notebook.read")
+def notebook_read(path: Path) -> Callable[[], Any]:
+    nb = write_notebook(path / "a.ipynb", new_notebook(500, 20_000))
+    return lambda: nbstore.store.read(nb)
+
+
+@benchmark("sync.parse")
+def sync_parse(path: Path) -> Callable[[], Any]:
+    write_notebook(path / "a.ipynb", new_notebook(2000))
+    sync = Synchronizer(Store(path))
+    text = new_page(2000)
+
+    def parse() -> None:
+        sync.parser.clear()
+        list(sync.parse(text))
+
+    return parse
+
+
+@benchmark("sync.parse.cached")
+def sync_parse_cached(path: Path) -> Callable[[], Any]:
+    write_notebook(path / "a.ipynb", new_notebook(2000))
+    sync = Synchronizer(Store(path))
+    text = new_page(2000)
+    return lambda: list(sync.parse(text))
+
+
+@benchmark("sync.parse.cold")
+def sync_parse_cold(path: Path) -> Callable[[], Any]:
+    write_notebook(path / "a.ipynb", new_notebook(500, 20_000))
+    store = Store(path)
+    text = new_page(500)
+    return lambda: list(Synchronizer(store).parse(text))
+
+
+@benchmark("sync.parse.incremental")
+def sync_parse_incremental(path: Path) -> Callable[[], Any]:
+    write_notebook(path / "a.ipynb", new_notebook(2000))
+    sync = Synchronizer(Store(path), incremental_parse=True)
+    text = new_page(2000)
+    index = len(text) // 2
+    counter = itertools.count()
+
+    def parse() -> None:
+        edit = f"{text[:index]}{next(counter)}{text[index:]}"
+        list(sync.parse(edit, "a.md"))
+
+    return parse
+
+
+@benchmark("sync.convert")
+def sync_convert(path: Path) -> Callable[[], Any]:
+    write_notebook(path / "a.ipynb", new_notebook(2000))
+    sync = Synchronizer(Store(path))
+    text = new_page(2000)
+    return partial(convert, sync, text)
+
+
+@benchmark("sync.convert.code_blocks", execute=True)
+def sync_convert_code_blocks(path: Path) -> Callable[[], Any]:
+    blocks = [
+        f'```python .md#c{k} source="on" title="{k}"\nprint({k})\n```\n'
+        for k in range(2000)
+    ]
+    sync = Synchronizer(Store(path))
+    text = "\n".join(blocks)
+    return partial(convert, sync, text)
+
+
+@benchmark("sync.convert.images")
+def sync_convert_images(path: Path) -> Callable[[], Any]:
+    write_notebook(path / "a.ipynb", new_notebook(200, 100_000))
+    sync = Synchronizer(Store(path))
+    text = new_page(200)
+    return partial(convert, sync, text)
+
+
+@benchmark("sync.convert_pages")
+def sync_convert_pages(path: Path) -> Callable[[], Any]:
+    for k in range(10):
+        write_notebook(path / f"{k}.ipynb", new_notebook(100, 1000))
+    sync = Synchronizer(Store(path))
+    pages = [(new_page(100, f"{k % 10}.ipynb"), f"{k}.md") for k in range(50)]
+
+    def convert_pages() -> None:
+        sync.parser.clear()
+        for _, elems in sync.convert_pages(pages):
+            list(elems)
+
+    return convert_pages
+
+
+def convert(sync: Synchronizer, text: str) -> None:
+    sync.parser.clear()
+    list(sync.convert(text))
+
+
+@benchmark("sync.execute", execute=True)
+def sync_execute(path: Path) -> Callable[[], Any]:
+    text = "\n".join(f'```python exec="1"\nprint({k})\n```' for k in range(20))
+    store = Store(path)
+    return lambda: list(Synchronizer(store).convert(text, "a.md"))
+
+
+@dataclass
+class Result:
+    time: float
+    peak: int
+    number: int
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Result:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    time = min(timer.repeat(repeat, number)) / number
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(time, peak, number)
+
+
+def run(
+    keyword: str = "",
+    *,
+    execute: bool = False,
+    repeat: int = 5,
+) -> dict[str, Result]:
+    results: dict[str, Result] = {}
+
+    for name, (setup, needs_kernel) in BENCHMARKS.items():
+        if keyword not in name or (needs_kernel and not execute):
+            continue
+
+        with tempfile.TemporaryDirectory() as directory:
+            func = setup(Path(directory))
+            func()
+            results[name] = result = measure(func, 1 if needs_kernel else repeat)
+
+        print(f"{name:24} {format_time(result.time)} {format_bytes(result.peak)}")
+
+    return results
+
+
+def compare(
+    baseline: dict[str, Any],
+    results: dict[str, Result],
+    threshold: float,
+) -> bool:
+    """Print the ratios to the baseline and return True if none regressed."""
+    ok = True
+
+    for name, result in results.items():
+        if not (base := baseline["results"].get(name)):
+            print(f"{name:24} not in baseline")
+            continue
+
+        time = result.time / base["time"]
+        peak = result.peak / base["peak"] if base["peak"] else 1
+        regressed = time > 1 + threshold or peak > 1 + threshold
+        ok = ok and not regressed
+        status = "REGRESSED" if regressed else "ok"
+        print(f"{name:24} time x{time:.2f} peak x{peak:.2f} {status}")
+
+    return ok
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-3:  # noqa: PLR2004
+        return f"{seconds * 1e6:9.1f} us"
+
+    if seconds < 1:
+        return f"{seconds * 1e3:9.1f} ms"
+
+    return f"{seconds:9.2f} s "
+
+
+def format_bytes(size: int) -> str:
+    return f"{size / 2**20:9.1f} MiB"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of nbsync.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_run = subparsers.add_parser("run", help="run the benchmarks")
+    parser_run.add_argument("--save", type=Path, help="save the results as a baseline")
+
+    parser_compare = subparsers.add_parser("compare", help="compare with a baseline")
+    parser_compare.add_argument("baseline", type=Path)
+    parser_compare.add_argument("--threshold", type=float, default=0.2)
+
+    for subparser in (parser_run, parser_compare):
+        subparser.add_argument("-k", default="", help="run benchmarks matching NAME")
+        subparser.add_argument("--execute", action="store_true", help="run kernels")
+        subparser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+
+    results = run(args.k, execute=args.execute, repeat=args.repeat)
+
+    if args.command == "compare":
+        return 0 if compare(baseline, results, args.threshold) else 1
+
+    if args.save:
+        data = {
+            "nbsync": version("nbsync"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": {name: asdict(result) for name, result in results.items()},
+        }
+        args.save.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,23 @@
-from nbstore import Store
+from __future__ import annotations
 
-from .cell import Cell
-from .sync import Synchronizer
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from nbstore import Store
+
+    from .cell import Cell
+    from .sync import Synchronizer
 
 __all__ = ["Cell", "Store", "Synchronizer"]
+
+_MODULES = {"Cell": "nbsync.cell", "Store": "nbstore", "Synchronizer": "nbsync.sync"}
+"""The modules of the public names, imported on first access."""
+
+
+def __getattr__(name: str) -> Any:
+    if module := _MODULES.get(name):
+        return getattr(importlib.import_module(module), name)
+
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
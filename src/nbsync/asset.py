@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+import nbstore.notebook
+
+if TYPE_CHECKING:
+    from nbformat import NotebookNode
+
+
+@dataclass(frozen=True)
+class Asset:
+    """A handle to an output stored in a file.
+
+    The content is read only when it is needed, so that the outputs of
+    executed notebooks are not kept in memory.
+    """
+
+    path: Path
+    mime: str
+    size: int
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    def read_bytes(self) -> bytes:
+        return self.path.read_bytes()
+
+
+class AssetStore:
+    """A content-addressed store of the binary outputs of notebooks.
+
+    Images and PDFs are decoded and written to files named after their
+    content, and the outputs of the notebook keep only a reference to
+    the file.
+    """
+
+    directory: Path
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def put(self, mime: str, content: bytes) -> Asset:
+        path = self.directory / get_image_filename(mime, content)
+
+        if not path.exists() or path.stat().st_size != len(content):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as file:
+                file.write(content)
+            Path(file.name).replace(path)
+
+        return Asset(path, mime, len(content))
+
+    def spill(self, nb: NotebookNode) -> int:
+        """Move the binary outputs of the notebook to files.
+
+        Return the number of outputs moved.
+        """
+        count = 0
+
+        for cell in nb["cells"]:
+            for output in cell.get("outputs", []):
+                data = output.get("data", {})
+                for mime, text in data.items():
+                    if not is_binary(mime) or not text:
+                        continue
+
+                    if isinstance(text, list):
+                        text = "".join(cast("list[str]", text))  # noqa: PLW2901
+
+                    asset = self.put(mime, base64.b64decode(text))
+                    data[mime] = ""
+                    set_asset(output, asset)
+                    count += 1
+
+        return count
+
+
+def is_binary(mime: str) -> bool:
+    """Return True if the output of the MIME type is base64 encoded."""
+    if mime == "application/pdf":
+        return True
+
+    return mime.startswith("image/") and mime != "image/svg+xml"
+
+
+def set_asset(output: NotebookNode, asset: Asset) -> None:
+    metadata = output.setdefault("metadata", {}).setdefault("nbsync", {})
+    assets = metadata.setdefault("assets", {})
+    assets[asset.mime] = {"path": str(asset.path), "size": asset.size}
+
+
+def get_asset(nb: NotebookNode, identifier: str) -> Asset | None:
+    """Return the spilled output of the cell to show, if any.
+
+    The output is chosen as `nbstore.notebook.get_mime_content` does, from
+    the same output and in the same order of the MIME types, since the
+    emptied data of a spilled output would be skipped by nbstore.
+    """
+    outputs = nbstore.notebook.get_outputs(nb, identifier)
+    if not (output := get_data_output(outputs)):
+        return None
+
+    data = output.get("data", {})
+    if data.get("image/svg+xml") or data.get("text/html"):
+        return None
+
+    if "application/pdf" in data:
+        mime = "application/pdf"
+    elif not (mime := next((m for m in data if m.startswith("image/")), "")):
+        return None
+
+    assets = output.get("metadata", {}).get("nbsync", {}).get("assets", {})
+    if info := assets.get(mime):
+        return Asset(Path(info["path"]), mime, info["size"])
+
+    return None
+
+
+def get_data_output(outputs: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """Return the output whose data nbstore reads."""
+    for output_type in ["display_data", "execute_result"]:
+        for output in outputs:
+            if output["output_type"] == output_type:
+                return output
+
+    return None
+
+
+def get_image_filename(mime: str, content: bytes | str) -> str:
+    """Return the filename of the image derived from its content.
+
+    The same image always gets the same filename, so that unchanged
+    images keep their URLs across builds.
+    """
+    if isinstance(content, str):
+        content = content.encode()
+
+    digest = hashlib.sha256(mime.encode() + b"\0" + content).hexdigest()
+    ext = mime.split("/")[1].split("+", maxsplit=1)[0]
+    return f"{digest[:32]}.{ext}"
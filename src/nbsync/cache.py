@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+import nbformat
+
+if TYPE_CHECKING:
+    from nbformat import NotebookNode
+
+VERSION = 1
+"""The version of the cache format. Bump to invalidate existing entries."""
+
+
+def normalize_source(source: str | list[str]) -> str:
+    if isinstance(source, list):
+        source = "".join(source)
+
+    return source.replace("\r\n", "\n").rstrip()
+
+
+def get_key(nb: NotebookNode) -> str:
+    """Return the content hash of the notebook used as a cache key.
+
+    The key covers the cell types and normalized sources, together with
+    the kernel name and language, so that outputs are only reused when
+    the notebook would be executed the same way.
+    """
+    metadata = nb.get("metadata", {})
+    kernelspec = metadata.get("kernelspec", {})
+    language_info = metadata.get("language_info", {})
+
+    data: dict[str, Any] = {
+        "version": VERSION,
+        "kernel": kernelspec.get("name", ""),
+        "language": kernelspec.get("language", language_info.get("name", "")),
+        "cells": [
+            [cell["cell_type"], normalize_source(cell["source"])]
+            for cell in nb["cells"]
+        ],
+    }
+
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Cache:
+    """On-disk cache of executed notebook outputs keyed by content hash."""
+
+    directory: Path
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def get_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def load(self, key: str, nb: NotebookNode) -> bool:
+        """Restore the outputs of the notebook from the cache.
+
+        Return True if the outputs were found and restored.
+        """
+        path = self.get_path(key)
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+
+        cells = data.get("cells", [])
+        if len(cells) != len(nb["cells"]):
+            return False
+
+        for cell, cached in zip(nb["cells"], cells, strict=True):
+            if cell["cell_type"] == "code":
+                outputs = nbformat.from_dict(cached["outputs"])  # pyright: ignore[reportUnknownMemberType]
+                cell["outputs"] = cast("list[NotebookNode]", outputs)
+                cell["execution_count"] = cached["execution_count"]
+
+        if language_info := data.get("language_info"):
+            info = cast("NotebookNode", nbformat.from_dict(language_info))  # pyright: ignore[reportUnknownMemberType]
+            nb["metadata"]["language_info"] = info
+
+        return True
+
+    def save(self, key: str, nb: NotebookNode) -> None:
+        """Store the outputs of the executed notebook in the cache."""
+        cells = [
+            {
+                "outputs": cell.get("outputs", []),
+                "execution_count": cell.get("execution_count"),
+            }
+            for cell in nb["cells"]
+        ]
+        data = {
+            "cells": cells,
+            "language_info": nb["metadata"].get("language_info", {}),
+        }
+
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=path.parent,
+            suffix=".tmp",
+            delete=False,
+        ) as file:
+            json.dump(data, file, ensure_ascii=False)
+
+        Path(file.name).replace(path)
@@ -2,11 +2,11 @@ from __future__ import annotations
 
 import html
 import textwrap
-import uuid
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
 from nbsync import logger
+from nbsync.asset import Asset, get_image_filename
 from nbsync.markdown import is_truelike
 
 if TYPE_CHECKING:
@@ -41,10 +41,10 @@ class Cell:
     mime: str
     """The MIME type of the image."""
 
-    content: bytes | str
-    """The content of the image."""
+    content: bytes | str | Asset
+    """The content of the image, or the handle to the file that stores it."""
 
-    def convert(self, *, escape: bool = False) -> str:
+    def convert(self, *, escape: bool = False, asset_dir: str = "") -> str:
         attrs = Attributes.pop(self.image.attributes)
 
         if include_attrs := self._include_attributes():
@@ -65,13 +65,20 @@ class Cell:
             result = get_text_markdown(self, attrs.result, escape=escape)
 
         else:
-            result = get_image_markdown(self)
+            result = get_image_markdown(self, asset_dir)
 
         if markdown := get_markdown(attrs.source, source, result, attrs.tabs):
             return textwrap.indent(markdown, self.image.indent)
 
         return ""  # no cov
 
+    def read_content(self) -> bytes | str:
+        """Return the content of the image, reading it from the file if stored."""
+        if isinstance(self.content, Asset):
+            return self.content.read_bytes()
+
+        return self.content
+
     def _include_attributes(self) -> bool:
         if "/" not in self.mime or not self.content:
             return True
@@ -90,7 +97,7 @@ def get_source(
         return ""
 
     if console:
-        output = str(cell.content.rstrip())
+        output = str(cell.content).rstrip()
         source = f"{_add_prompt(source)}\n{output}"
 
     attrs = [cell.language]
@@ -117,7 +124,7 @@ def _add_prompt(source: str) -> str:
 
 
 def get_text_markdown(cell: Cell, result: str, *, escape: bool = False) -> str:
-    text = str(cell.content.rstrip())
+    text = str(cell.content).rstrip()
 
     if result:
         result = "text" if is_truelike(result) else result
@@ -129,7 +136,7 @@ def get_text_markdown(cell: Cell, result: str, *, escape: bool = False) -> str:
     return text
 
 
-def get_image_markdown(cell: Cell) -> str:
+def get_image_markdown(cell: Cell, asset_dir: str = "") -> str:
     msg = f"{cell.image.url}#{cell.image.identifier} [{cell.mime}]"
     logger.debug(f"Converting image: {msg}")
 
@@ -137,8 +144,12 @@ def get_image_markdown(cell: Cell) -> str:
         cell.image.url = ""
         return ""
 
-    ext = cell.mime.split("/")[1].split("+")[0]
-    cell.image.url = f"{uuid.uuid4()}.{ext}"
+    if isinstance(cell.content, Asset):
+        cell.image.url = cell.content.name
+    else:
+        cell.image.url = get_image_filename(cell.mime, cell.content)
+    if asset_dir:
+        cell.image.url = f"{asset_dir.rstrip('/')}/{cell.image.url}"
 
     attr = " ".join(cell.image.iter_parts(include_identifier=True))
     return f"![{cell.image.alt}]({cell.image.url}){{{attr}}}"
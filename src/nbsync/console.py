@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import subprocess
+from typing import TYPE_CHECKING, Any
+
+import nbformat
+
+from nbsync.limits import Limits, Monitor
+from nbsync.markdown import split_command
+
+if TYPE_CHECKING:
+    from nbformat import NotebookNode
+
+
+def get_metadata(command: str, cwd: str | None = None) -> dict[str, Any]:
+    """Return the cell metadata that records the console command."""
+    return {"nbsync": {"console": command, "workdir": cwd}}
+
+
+def get_command(cell: NotebookNode) -> tuple[list[str], str | None] | None:
+    metadata = cell.get("metadata", {}).get("nbsync", {})
+    if (command := metadata.get("console")) is None:
+        return None
+
+    return split_command(command), metadata.get("workdir")
+
+
+def is_console(nb: NotebookNode) -> bool:
+    """Return True if all the cells of the notebook are console commands."""
+    cells = nb["cells"]
+    return bool(cells) and all(get_command(cell) is not None for cell in cells)
+
+
+def execute(nb: NotebookNode, limits: Limits | None = None) -> None:
+    """Run the console commands of the notebook without a kernel.
+
+    The commands run one after another in the current working directory
+    or their `workdir`, and the standard output of each command becomes
+    the stream output of its cell, just as the generated Python source
+    would produce in a kernel.
+    """
+    limits = limits or Limits()
+    monitor = Monitor(nb, limits)
+
+    for cell in nb["cells"]:
+        cell["outputs"] = []
+
+        if not (command := get_command(cell)) or not command[0]:
+            continue
+
+        args, cwd = command
+        timeout = monitor(cell)
+        try:
+            stdout = run(args, cwd, timeout, limits)
+        except subprocess.TimeoutExpired as e:
+            raise monitor.timeout_error() from e
+
+        text = f"{stdout.rstrip()}\n"
+        output = nbformat.v4.new_output("stream", name="stdout", text=text)  # pyright: ignore[reportUnknownMemberType]
+        cell["outputs"].append(output)
+
+
+def run(
+    args: list[str],
+    cwd: str | None,
+    timeout: float | None,
+    limits: Limits,
+) -> str:
+    """Run the command like `subprocess.check_output` with the limits."""
+    with subprocess.Popen(  # noqa: S603
+        args,
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=cwd,
+        **limits.get_process_kwargs(),
+    ) as process:
+        limits.apply(process.pid)
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            raise
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args, output)
+
+    return output
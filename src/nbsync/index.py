@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from nbstore import Store
+
+
+class Index:
+    """The notebooks referenced by each page, and the pages by notebook.
+
+    The index is updated each time a page is parsed, so that the pages
+    to convert again can be found when some notebooks change.
+    """
+
+    pages: dict[str, set[str]]
+    notebooks: dict[str, set[str]]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.pages = {}
+        self.notebooks = {}
+        self._lock = threading.Lock()
+
+    def update(self, src_uri: str, urls: Iterable[str]) -> None:
+        """Set the URLs of the notebooks referenced by the page."""
+        urls = set(urls)
+
+        with self._lock:
+            self._remove(src_uri)
+            self.pages[src_uri] = urls
+            for url in urls:
+                self.notebooks.setdefault(url, set()).add(src_uri)
+
+    def remove(self, src_uri: str) -> None:
+        with self._lock:
+            self._remove(src_uri)
+
+    def _remove(self, src_uri: str) -> None:
+        for url in self.pages.pop(src_uri, ()):
+            pages = self.notebooks[url]
+            pages.discard(src_uri)
+            if not pages:
+                del self.notebooks[url]
+
+    def get_pages(self, urls: Iterable[str]) -> set[str]:
+        """Return the source URIs of the pages that reference the notebooks."""
+        with self._lock:
+            return {p for url in urls for p in self.notebooks.get(url, ())}
+
+    def get_notebooks(self, src_uri: str) -> set[str]:
+        with self._lock:
+            return set(self.pages.get(src_uri, ()))
+
+    def find_urls(self, store: Store, paths: Iterable[str | Path]) -> set[str]:
+        """Return the URLs of the notebooks in the index stored at the paths.
+
+        The URLs are matched against the paths in every source directory
+        of the store, so that a notebook that did not exist when the page
+        was parsed is found when it is created.
+        """
+        paths = {Path(path).absolute() for path in paths}
+
+        with self._lock:
+            urls = list(self.notebooks)
+
+        return {url for url in urls if any(p in paths for p in iter_paths(store, url))}
+
+
+def iter_paths(store: Store, url: str) -> Iterator[Path]:
+    """Yield the paths where the store looks for the notebook of the URL."""
+    if Path(url).is_absolute():
+        yield Path(url)
+        return
+
+    for src_dir in store.src_dirs:
+        yield (src_dir / url).absolute()
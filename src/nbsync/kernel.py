@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+import nbformat
+
+from nbsync.limits import Limits, Monitor
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from nbclient import NotebookClient
+    from nbformat import NotebookNode
+
+
+class Kernel:
+    """A live kernel that executes a notebook incrementally.
+
+    The kernel is kept alive between executions. When cells are only
+    appended to the notebook, the outputs of the previous cells are reused,
+    and only the new cells are run in the live kernel. Any other change
+    restarts the kernel, so that the outputs are the same as those of a
+    fresh execution.
+    """
+
+    preamble: str
+    limits: Limits
+    client: NotebookClient | None
+    cells: list[NotebookNode]
+    language_info: dict[str, Any]
+    _stack: ExitStack
+
+    def __init__(self, preamble: str = "", limits: Limits | None = None) -> None:
+        self.preamble = preamble
+        self.limits = limits or Limits()
+        self.client = None
+        self.cells = []
+        self.language_info = {}
+        self._stack = ExitStack()
+
+    def start(self, nb: NotebookNode | None = None) -> NotebookClient:
+        self.shutdown()
+
+        if nb is None:
+            nb = nbformat.v4.new_notebook()  # pyright: ignore[reportUnknownMemberType]
+
+        client = new_client(nb)
+        kwargs = self.limits.get_process_kwargs()
+        self._stack.enter_context(client.setup_kernel(**kwargs))
+        self.client = client
+        atexit.register(self.shutdown)
+        apply_limits(client, self.limits)
+
+        info = client.wait_for_reply(client.kc.kernel_info())  # pyright: ignore[reportOptionalMemberAccess]
+        self.language_info = info["content"]["language_info"] if info else {}
+
+        if self.preamble:
+            self.run(self.preamble)
+
+        return client
+
+    def shutdown(self) -> None:
+        atexit.unregister(self.shutdown)
+        self._stack.close()
+        self.client = None
+        self.cells = []
+
+    def run(self, source: str) -> None:
+        """Run the source in the kernel without recording it in the notebook."""
+        client = self.client or self.start()
+        cell = nbformat.v4.new_code_cell(source)  # pyright: ignore[reportUnknownMemberType]
+
+        nb, client.nb = client.nb, nbformat.v4.new_notebook(cells=[cell])  # pyright: ignore[reportUnknownMemberType]
+        try:
+            with check(client, Monitor(client.nb, self.limits)):
+                client.execute_cell(cell, 0, store_history=False)
+        finally:
+            client.nb = nb
+
+    def reset(self) -> None:
+        """Clear the namespace of the kernel and run the preamble again."""
+        if self.client is None:
+            return
+
+        self.run(f"%reset -f\n{self.preamble}")
+        self.cells = []
+
+    def execute(self, nb: NotebookNode, limits: Limits | None = None) -> int:
+        """Execute the notebook and return the number of cells that were run.
+
+        The limits override the limits of the kernel for this execution.
+        """
+        limits = limits or self.limits
+
+        if self.client is None or not is_appended(self.cells, nb["cells"]):
+            client = self.start(nb)
+            index = 0
+        else:
+            client = self.client
+            client.nb = nb
+            index = len(self.cells)
+
+        apply_limits(client, limits)
+
+        for cell, cached in zip(nb["cells"][:index], self.cells, strict=False):
+            if cell["cell_type"] == "code":
+                cell["outputs"] = cached["outputs"]
+                cell["execution_count"] = cached["execution_count"]
+
+        try:
+            with check(client, Monitor(nb, limits)):
+                for k, cell in enumerate(nb["cells"][index:], index):
+                    client.execute_cell(cell, k)
+        except BaseException:
+            self.shutdown()
+            raise
+
+        nb["metadata"]["language_info"] = self.language_info
+        self.cells = list(nb["cells"])
+
+        return len(nb["cells"]) - index
+
+
+def get_first_changed_index(
+    cells: list[NotebookNode],
+    other: list[NotebookNode],
+) -> int:
+    """Return the index of the first cell whose source differs.
+
+    If one list is a prefix of the other, the length of the shorter list
+    is returned.
+    """
+    for index, (cell, other_cell) in enumerate(zip(cells, other, strict=False)):
+        if cell["source"] != other_cell["source"]:
+            return index
+
+    return min(len(cells), len(other))
+
+
+def is_appended(cells: list[NotebookNode], other: list[NotebookNode]) -> bool:
+    """Return True if the other cells only add cells after the cells.
+
+    The cells must be a strict prefix of the other cells, unless no cell
+    has been run yet.
+    """
+    if not cells:
+        return True
+
+    index = get_first_changed_index(cells, other)
+    return index == len(cells) < len(other)
+
+
+class KernelPool:
+    """A pool of pre-started kernels leased by the notebooks of pages.
+
+    Each kernel runs the preamble, such as heavy imports, when it starts.
+    A released kernel is reset and returned to the pool, so that the
+    next page gets a clean namespace without paying the kernel startup.
+    """
+
+    size: int
+    preamble: str
+    limits: Limits | None
+    kernels: list[Kernel]
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        size: int = 1,
+        preamble: str = "",
+        limits: Limits | None = None,
+    ) -> None:
+        self.size = size
+        self.preamble = preamble
+        self.limits = limits
+        self.kernels = []
+        self._lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Start kernels concurrently until the pool is full."""
+        with self._lock:
+            n = self.size - len(self.kernels)
+
+        if n <= 0:
+            return
+
+        with ThreadPoolExecutor(n) as executor:
+            futures = [executor.submit(self.start) for _ in range(n)]
+            kernels = [future.result() for future in futures]
+
+        with self._lock:
+            self.kernels.extend(kernels)
+
+    def start(self) -> Kernel:
+        kernel = Kernel(self.preamble, self.limits)
+        kernel.start()
+        return kernel
+
+    def acquire(self) -> Kernel:
+        with self._lock:
+            if self.kernels:
+                return self.kernels.pop()
+
+        return self.start()
+
+    def release(self, kernel: Kernel) -> None:
+        try:
+            kernel.reset()
+        except Exception:  # noqa: BLE001
+            kernel.shutdown()
+
+        with self._lock:
+            if kernel.client is not None and len(self.kernels) < self.size:
+                self.kernels.append(kernel)
+                return
+
+        kernel.shutdown()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            kernels, self.kernels = self.kernels, []
+
+        for kernel in kernels:
+            kernel.shutdown()
+
+
+def execute(nb: NotebookNode, limits: Limits | None = None) -> None:
+    """Execute the notebook in a new kernel."""
+    limits = limits or Limits()
+    client = new_client(nb)
+    client.on_notebook_start = partial(apply_limits, client, limits)
+
+    with check(client, Monitor(nb, limits)):
+        client.execute(**limits.get_process_kwargs())
+
+
+async def aexecute(nb: NotebookNode, limits: Limits | None = None) -> None:
+    """Execute the notebook in a new kernel without blocking the event loop."""
+    limits = limits or Limits()
+    client = new_client(nb)
+    client.on_notebook_start = partial(apply_limits, client, limits)
+
+    with check(client, Monitor(nb, limits)):
+        await client.async_execute(**limits.get_process_kwargs())
+
+
+def new_client(nb: NotebookNode) -> NotebookClient:
+    try:
+        from nbclient import NotebookClient
+    except ModuleNotFoundError:  # no cov
+        msg = "nbclient is not installed"
+        raise ModuleNotFoundError(msg) from None
+
+    return NotebookClient(nb)
+
+
+def apply_limits(client: NotebookClient, limits: Limits, **_: Any) -> None:
+    """Apply the limits to the process of the kernel started by the client.
+
+    It is also called as the `on_notebook_start` hook of the client.
+    """
+    provisioner = getattr(client.km, "provisioner", None)
+    if (pid := getattr(provisioner, "pid", None)) is not None:
+        limits.apply(pid)
+
+
+@contextmanager
+def check(client: NotebookClient, monitor: Monitor) -> Iterator[None]:
+    """Apply the timeouts of the monitor to the client.
+
+    The errors of timeouts and dead kernels are raised again with the
+    name of the cell that was being executed.
+    """
+    from nbclient.exceptions import CellTimeoutError, DeadKernelError
+
+    # nbclient annotates the timeout as int, but accepts seconds as float.
+    client.timeout_func = monitor  # pyright: ignore[reportAttributeAccessIssue]
+
+    try:
+        yield
+    except CellTimeoutError as e:
+        raise monitor.timeout_error() from e
+    except DeadKernelError as e:
+        raise monitor.dead_kernel_error() from e
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+from functools import cache, partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from nbsync import logger
+
+if TYPE_CHECKING:
+    from nbformat import NotebookNode
+
+
+@dataclass(frozen=True)
+class Limits:
+    """The limits of the execution of a notebook.
+
+    `timeout` is the default timeout of a cell in seconds, which is
+    overridden by the `timeout` attribute of a code block. `notebook_timeout`
+    bounds the total time of a notebook. `memory` in bytes and `cpu` in
+    seconds are the resource limits of the kernel or console process.
+    `cpu` bounds each execution, also in a kernel that is kept alive
+    between executions. `None` disables a limit, and so does a timeout
+    of zero.
+    """
+
+    timeout: float | None = 600
+    notebook_timeout: float | None = None
+    memory: int | None = None
+    cpu: int | None = None
+
+    def get_process_kwargs(self) -> dict[str, Any]:
+        """Return the keyword arguments of a new process to apply the limits.
+
+        The limits are set in the new process by `preexec_fn` only where
+        `resource.prlimit` is not available, since `preexec_fn` is not
+        safe with threads. Elsewhere, `apply` sets them once the process
+        has started. On Windows, the limits are not supported and are
+        ignored with a warning.
+        """
+        if (self.memory is None and self.cpu is None) or has_prlimit():
+            return {}
+
+        if sys.platform == "win32":
+            warn_unsupported()
+            return {}
+
+        return {"preexec_fn": partial(set_rlimits, self.memory, self.cpu)}
+
+    def apply(self, pid: int) -> None:
+        """Apply the limits to the running process with `resource.prlimit`.
+
+        The soft CPU limit is set above the CPU time already used by the
+        process, so that it can be applied again before each execution.
+        """
+        if (self.memory is None and self.cpu is None) or not has_prlimit():
+            return
+
+        import resource
+
+        if self.memory is not None:
+            _, hard = resource.prlimit(pid, resource.RLIMIT_AS)
+            resource.prlimit(pid, resource.RLIMIT_AS, (self.memory, hard))
+
+        if self.cpu is not None:
+            cpu = math.ceil(get_cpu_time(pid)) + self.cpu
+            _, hard = resource.prlimit(pid, resource.RLIMIT_CPU)
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu, hard))
+
+
+def has_prlimit() -> bool:
+    try:
+        import resource
+    except ModuleNotFoundError:  # no cov
+        return False
+
+    return hasattr(resource, "prlimit")
+
+
+@cache
+def warn_unsupported() -> None:
+    logger.warning("Memory and CPU limits are not supported on Windows")
+
+
+def set_rlimits(memory: int | None, cpu: int | None) -> None:  # no cov
+    import resource
+
+    if memory is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+    if cpu is not None:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+
+
+def get_cpu_time(pid: int) -> float:
+    """Return the CPU time used by the process in seconds, or 0 if unknown."""
+    try:
+        text = Path(f"/proc/{pid}/stat").read_text(encoding="utf-8")
+        fields = text.rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return 0
+
+    ticks = int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def get_timeout(cell: NotebookNode) -> float | None:
+    """Return the timeout of the cell set by the `timeout` attribute."""
+    return cell.get("metadata", {}).get("nbsync", {}).get("timeout")
+
+
+class Monitor:
+    """The timeouts of the cells of a notebook being executed.
+
+    It is called with each cell before the cell is executed, and returns
+    the timeout of the cell, shortened so that the notebook finishes
+    within its timeout. The last cell is kept to name it in errors.
+    """
+
+    nb: NotebookNode
+    limits: Limits
+    deadline: float | None
+    cell: NotebookNode | None
+
+    def __init__(self, nb: NotebookNode, limits: Limits) -> None:
+        self.nb = nb
+        self.limits = limits
+        self.cell = None
+
+        if limits.notebook_timeout is None:
+            self.deadline = None
+        else:
+            self.deadline = time.monotonic() + limits.notebook_timeout
+
+    def __call__(self, cell: NotebookNode) -> float | None:
+        self.cell = cell
+
+        timeout = get_timeout(cell)
+        if timeout is None:
+            timeout = self.limits.timeout
+        if timeout is not None and timeout <= 0:
+            timeout = None
+
+        if self.deadline is None:
+            return timeout
+
+        remaining = max(self.deadline - time.monotonic(), 1e-3)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def get_cell_name(self) -> str:
+        from nbsync.notebook import get_identifier
+
+        if self.cell is None:
+            return "unknown cell"
+
+        if identifier := get_identifier(self.cell):
+            return f"cell {identifier!r}"
+
+        for index, cell in enumerate(self.nb["cells"]):
+            if cell is self.cell:
+                return f"cell [{index}]"
+
+        return "unknown cell"
+
+    def timeout_error(self) -> TimeoutError:
+        """Return the error that names the cell that timed out."""
+        name = self.get_cell_name()
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            timeout = self.limits.notebook_timeout
+            msg = f"Notebook timed out after {timeout} seconds in {name}"
+        else:
+            timeout = get_timeout(self.cell) if self.cell else None
+            timeout = self.limits.timeout if timeout is None else timeout
+            msg = f"Timed out after {timeout} seconds in {name}"
+
+        return TimeoutError(msg)
+
+    def dead_kernel_error(self) -> RuntimeError:
+        return RuntimeError(f"Kernel died in {self.get_cell_name()}")
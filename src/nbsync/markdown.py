@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 import shlex
 import textwrap
 from typing import TYPE_CHECKING, TypeAlias
@@ -8,7 +9,7 @@ import nbstore.markdown
 from nbstore.markdown import CodeBlock, Image
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Iterator
+    from collections.abc import Container, Iterable, Iterator
 
 Element: TypeAlias = str | CodeBlock | Image
 
@@ -27,7 +28,8 @@ def _convert_code_block_tabbed(code_block: CodeBlock) -> Iterator[Element]:
         yield code_block
         return
 
-    markdown = code_block.text.replace('source="tabbed-nbsync"', "")
+    line, newline, body = code_block.text.partition("\n")
+    markdown = f"{strip_attributes(line, SOURCE)}{newline}{body}"
     markdown = textwrap.indent(markdown, "    ")
     yield f'===! "Markdown"\n\n{markdown}\n\n'
 
@@ -36,6 +38,38 @@ def _convert_code_block_tabbed(code_block: CodeBlock) -> Iterator[Element]:
     yield from nbstore.markdown.parse(text)
 
 
+FENCE_PATTERN = re.compile(r"\s*(?:`{3,}|~{3,})")
+
+ATTRIBUTE_PATTERN = re.compile(
+    r"(?P<key>[\w-]+)=(?:\"[^\"]*\"|'[^']*'|[^\s}]+)|[^\s{}]+#(?P<identifier>[^\s{}]+)",
+)
+"""The pattern of a `key=value` attribute or a `url#identifier` reference."""
+
+SOURCE = frozenset(["source"])
+
+
+def strip_attributes(
+    line: str,
+    keys: Container[str] = (),
+    identifier: str = "",
+) -> str:
+    """Remove attributes from the opening fence line of a code block.
+
+    The attributes of the keys and the reference to the identifier are
+    removed in a single pass, leaving the rest of the line as it is.
+    """
+    fence = FENCE_PATTERN.match(line)
+    start = fence.end() if fence else 0
+
+    def replace(match: re.Match[str]) -> str:
+        if (key := match["key"]) is not None:
+            return "" if key in keys else match[0]
+
+        return "" if identifier and match["identifier"] == identifier else match[0]
+
+    return line[:start] + ATTRIBUTE_PATTERN.sub(replace, line[start:])
+
+
 def _convert_code_block_attrs(code_block: CodeBlock) -> CodeBlock | Image:
     exec_ = code_block.attributes.get("exec", None)
     if exec_ != "1" or not code_block.classes:
@@ -79,24 +113,38 @@ def convert_image(image: Image, index: int | None = None) -> Iterator[Element]:
 
 
 def create_code_block(image: Image) -> CodeBlock:
-    if "console" in image.classes:
-        cwd = image.attributes.pop("workdir", None)
-        source = create_subprocess_source(image.source, cwd=cwd)
-    else:
-        source = image.source
+    attrs: dict[str, str] = {}
+    if (timeout := image.attributes.pop("timeout", None)) is not None:
+        attrs["timeout"] = timeout
+
+    if "console" not in image.classes:
+        return CodeBlock("", image.identifier, [], attrs, image.source, image.url)
+
+    cwd = image.attributes.pop("workdir", None)
+    source = create_subprocess_source(image.source, cwd=cwd)
+    attrs["command"] = image.source
+    if cwd is not None:
+        attrs["workdir"] = cwd
+
+    return CodeBlock("", image.identifier, ["console"], attrs, source, image.url)
+
 
-    return CodeBlock("", image.identifier, [], {}, source, image.url)
+def split_command(source: str) -> list[str]:
+    """Split the command into arguments, removing the leading prompt."""
+    args = shlex.split(source)
+
+    if args and args[0] in ["$", "#", ">"]:
+        return args[1:]
+
+    return args
 
 
 def create_subprocess_source(source: str, cwd: str | None = None) -> str:
     """Create a Python source that runs the command in subprocess."""
-    args = shlex.split(source)
+    args = split_command(source)
     if not args:
         return ""
 
-    if args[0] in ["$", "#", ">"]:
-        args = args[1:]
-
     cwd = "" if cwd is None else f", cwd='{cwd}'"
 
     return textwrap.dedent(f"""\
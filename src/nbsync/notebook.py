@@ -1,14 +1,28 @@
 from __future__ import annotations
 
 import copy
+import hashlib
+import json
 import os
 import time
-from typing import TYPE_CHECKING
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import TYPE_CHECKING, Any, Protocol
 
 import nbstore.notebook
+from nbformat import NotebookNode
+from typing_extensions import override
+
+import nbsync.console
+import nbsync.kernel
+from nbsync.cache import get_key
 
 if TYPE_CHECKING:
-    from nbformat import NotebookNode
+    from collections.abc import Iterator
+
+    from nbsync.cache import Cache
+    from nbsync.kernel import Kernel
+    from nbsync.limits import Limits
 
 # DeprecationWarning: Jupyter is migrating its paths to use standard platformdirs
 os.environ.setdefault("JUPYTER_PLATFORM_DIRS", "1")
@@ -18,30 +32,373 @@ class Notebook:
     nb: NotebookNode
     is_modified: bool
     execution_needed: bool
+    executed: bool
+    _hash: Hash | None
+    _shared: int
+    _index: dict[str, NotebookNode] | None
+    _output_bytes: int | None
 
     def __init__(self, nb: NotebookNode) -> None:
         self.nb = nb
         self.is_modified = False
         self.execution_needed = False
+        self.executed = False
+        self._hash = None
+        self._shared = 0
+        self._index = None
+        self._output_bytes = None
+
+    @property
+    def fingerprint(self) -> str:
+        """The hash of the cell sources, used to detect changes.
+
+        The `nbsync` metadata of the cells, such as timeouts and console
+        commands, is hashed as well. It is computed on first access and
+        then updated as cells are added, so that outputs are never walked.
+        """
+        if self._hash is None:
+            self._hash = hashlib.sha256()
+            for cell in self.nb["cells"]:
+                update_hash(self._hash, cell)
+
+        return self._hash.hexdigest()
+
+    @property
+    def index(self) -> dict[str, NotebookNode]:
+        """The mapping from cell identifiers to cells.
+
+        It is built on first access, extended as cells are added, and
+        rebuilt after the cells are replaced by copies or executed.
+        """
+        if self._index is None:
+            self._index = {}
+            for cell in self.nb["cells"]:
+                add_index(self._index, cell)
+
+        return self._index
+
+    @property
+    def output_bytes(self) -> int:
+        """The size of the outputs written by executing the notebook.
+
+        The outputs read from the file are not counted, since they are
+        kept by the reader. It is computed on first access after the
+        notebook is executed or restored.
+        """
+        if not self.executed:
+            return 0
+
+        if self._output_bytes is None:
+            cells = self.nb["cells"]
+            self._output_bytes = sum(get_output_bytes(cell) for cell in cells)
+
+        return self._output_bytes
+
+    def select(self, identifier: str) -> NotebookNode:
+        """Return a notebook that contains only the cell of the identifier.
+
+        The notebook shares the metadata of this notebook, so that the
+        nbstore functions can be applied to it without scanning all cells.
+        """
+        cell = self.index.get(identifier)
+        return NotebookNode({**self.nb, "cells": [cell] if cell else []})
 
     def set_execution_needed(self) -> None:
         self.execution_needed = True
 
-    def add_cell(self, identifier: str, source: str) -> None:
-        if not self.is_modified:
-            self.nb = copy.deepcopy(self.nb)
-            self.is_modified = True
+    def add_cell(
+        self,
+        identifier: str,
+        source: str,
+        metadata: dict[str, Any] | None = None,
+    ) -> None:
+        self._overlay()
 
         cell = nbstore.notebook.new_code_cell(identifier, source)
+        if metadata:
+            cell.metadata.update(metadata)
         self.nb.cells.append(cell)
         self.set_execution_needed()
 
+        if self._hash is not None:
+            update_hash(self._hash, cell)
+
+        if self._index is not None:
+            add_index(self._index, cell)
+
     def equals(self, other: Notebook) -> bool:
-        return nbstore.notebook.equals(self.nb, other.nb)
+        return self.fingerprint == other.fingerprint
+
+    def _overlay(self) -> None:
+        if not self.is_modified:
+            self.nb = overlay(self.nb)
+            self._shared = len(self.nb.cells)
+            self.is_modified = True
+
+    def materialize(self) -> None:
+        """Replace the cells shared with the original notebook by copies.
+
+        This is needed before the outputs are written to the cells, also
+        when no cell has been added, so that the notebook read from the
+        store is never modified. The original outputs and execution
+        timings are not copied, since they are replaced.
+        """
+        self._overlay()
+        cells = self.nb.cells
+        for index in range(self._shared):
+            cells[index] = copy_cell(cells[index])
+        self._shared = 0
+        self._index = None
+
+    def restore(self, cache: Cache) -> bool:
+        self.materialize()
+        if not cache.load(get_key(self.nb), self.nb):
+            return False
+
+        self.execution_needed = False
+        self.executed = True
+        self._index = None
+        self._output_bytes = None
+        return True
+
+    def execute(
+        self,
+        cache: Cache | None = None,
+        kernel: Kernel | None = None,
+        limits: Limits | None = None,
+    ) -> float:
+        """Execute the notebook and return the elapsed time.
+
+        The limits apply to a new kernel, a given kernel, or console
+        commands. A given kernel applies its own limits if none are given.
+        """
+        key = get_key(self.nb) if cache else ""
+        self.materialize()
 
-    def execute(self) -> float:
         start_time = time.perf_counter()
-        nbstore.notebook.execute(self.nb)
+        if nbsync.console.is_console(self.nb):
+            nbsync.console.execute(self.nb, limits)
+        elif kernel:
+            kernel.execute(self.nb, limits)
+        else:
+            nbsync.kernel.execute(self.nb, limits)
         end_time = time.perf_counter()
-        self.execution_needed = False
+        self.finish(cache, key)
+
+        return end_time - start_time
+
+    async def aexecute(
+        self,
+        cache: Cache | None = None,
+        limits: Limits | None = None,
+    ) -> float:
+        """Execute the notebook without blocking the event loop.
+
+        Console commands run in a worker thread, and the other notebooks
+        are executed by an asynchronous client in a new kernel.
+        """
+        if nbsync.console.is_console(self.nb):
+            import asyncio
+
+            return await asyncio.to_thread(self.execute, cache, None, limits)
+
+        key = get_key(self.nb) if cache else ""
+        self.materialize()
+
+        start_time = time.perf_counter()
+        await nbsync.kernel.aexecute(self.nb, limits)
+        end_time = time.perf_counter()
+        self.finish(cache, key)
+
         return end_time - start_time
+
+    def finish(self, cache: Cache | None, key: str) -> None:
+        self.execution_needed = False
+        self.executed = True
+        self._index = None
+        self._output_bytes = None
+
+        if cache:
+            cache.save(key, self.nb)
+
+
+class Notebooks(MutableMapping[str, Notebook]):
+    """The notebooks of the pages by URL, evicting the least used ones.
+
+    `evict` drops the least recently used notebooks while there are more
+    than `max_count` of them, or their outputs exceed `max_bytes`. The
+    fingerprint of an evicted notebook and whether it was executed are
+    kept in `evicted`, so that a notebook that returns unchanged can be
+    executed again to get back the outputs it had. Only the last
+    `max_evicted` of them are kept.
+    """
+
+    max_count: int | None
+    max_bytes: int | None
+    max_evicted: int
+    entries: OrderedDict[str, Notebook]
+    evicted: OrderedDict[str, tuple[str, bool]]
+
+    def __init__(
+        self,
+        max_count: int | None = None,
+        max_bytes: int | None = None,
+        max_evicted: int = 1024,
+    ) -> None:
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.max_evicted = max_evicted
+        self.entries = OrderedDict()
+        self.evicted = OrderedDict()
+
+    @override
+    def __getitem__(self, url: str) -> Notebook:
+        return self.entries[url]
+
+    @override
+    def __setitem__(self, url: str, notebook: Notebook) -> None:
+        self.entries[url] = notebook
+        self.entries.move_to_end(url)
+        self.evicted.pop(url, None)
+
+    @override
+    def __delitem__(self, url: str) -> None:
+        del self.entries[url]
+
+    @override
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    @override
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def touch(self, url: str) -> None:
+        """Mark the notebook as recently used."""
+        if url in self.entries:
+            self.entries.move_to_end(url)
+
+    def was_executed(self, url: str, notebook: Notebook) -> bool:
+        """Return True if the notebook was evicted unchanged after execution."""
+        return self.evicted.get(url) == (notebook.fingerprint, True)
+
+    def evict(self) -> list[str]:
+        """Evict the least recently used notebooks over the limits.
+
+        Returns:
+            The URLs of the evicted notebooks.
+        """
+        urls: list[str] = []
+        nbytes = 0 if self.max_bytes is None else self.nbytes
+
+        while self.entries and (
+            (self.max_count is not None and len(self.entries) > self.max_count)
+            or (self.max_bytes is not None and nbytes > self.max_bytes)
+        ):
+            url, notebook = self.entries.popitem(last=False)
+            self.evicted[url] = (notebook.fingerprint, notebook.executed)
+            self.evicted.move_to_end(url)
+            nbytes -= notebook.output_bytes
+            urls.append(url)
+
+        while len(self.evicted) > self.max_evicted:
+            self.evicted.popitem(last=False)
+
+        return urls
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of the outputs of the notebooks."""
+        return sum(notebook.output_bytes for notebook in self.entries.values())
+
+
+class Hash(Protocol):
+    def update(self, data: bytes, /) -> None: ...
+
+    def hexdigest(self) -> str: ...
+
+
+def update_hash(hash_: Hash, cell: NotebookNode) -> None:
+    source: str | list[str] = cell["source"]
+    if isinstance(source, list):
+        source = "".join(source)
+
+    metadata = cell.get("metadata", {}).get("nbsync")
+    for text in (source, json.dumps(metadata, sort_keys=True)):
+        data = text.encode()
+        hash_.update(len(data).to_bytes(8, "little"))
+        hash_.update(data)
+
+
+PREFIXES = ("# #", "# %% #", "#| label: ", "# | label: ")
+"""The prefixes of the identifier line, as recognized by nbstore."""
+
+
+def get_identifier(cell: NotebookNode) -> str | None:
+    source: str | list[str] = cell["source"]
+    if isinstance(source, list):
+        source = "".join(source)
+
+    line, newline, _ = source.partition("\n")
+    if not newline:
+        return None
+
+    for prefix in PREFIXES:
+        if line.startswith(prefix):
+            return line[len(prefix) :]
+
+    return None
+
+
+def add_index(index: dict[str, NotebookNode], cell: NotebookNode) -> None:
+    if (identifier := get_identifier(cell)) is not None:
+        index.setdefault(identifier, cell)
+
+
+def overlay(nb: NotebookNode) -> NotebookNode:
+    """Return a new notebook that shares the cells of the original.
+
+    The metadata is copied, while the cell list refers to the original
+    cells, so that appending cells does not duplicate existing outputs.
+    """
+    node = NotebookNode(nb)
+    node["metadata"] = copy.deepcopy(nb["metadata"])
+    node["cells"] = list(nb["cells"])
+    return node
+
+
+def get_output_bytes(cell: NotebookNode) -> int:
+    """Return the size of the text and data of the outputs of the cell.
+
+    The lengths of the strings are summed instead of serializing the
+    outputs, so that large images are not copied to measure them.
+    """
+    size = 0
+
+    for output in cell.get("outputs", []):
+        size += get_size(output.get("text", ""))
+        size += sum(get_size(value) for value in output.get("data", {}).values())
+        size += get_size(output.get("traceback", []))
+
+    return size
+
+
+def get_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+
+    if isinstance(value, list):
+        return sum(len(x) for x in value if isinstance(x, str))  # pyright: ignore[reportUnknownVariableType]
+
+    return len(json.dumps(value))
+
+
+def copy_cell(cell: NotebookNode) -> NotebookNode:
+    if cell["cell_type"] != "code":
+        return cell
+
+    cell = NotebookNode(cell)
+    cell["metadata"] = copy.deepcopy(cell["metadata"])
+    cell["metadata"].pop("execution", None)
+    cell["outputs"] = []
+    return cell
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import TYPE_CHECKING, Literal, TypeAlias
+
+import nbstore.markdown
+from nbstore.markdown import CodeBlock, Image
+
+import nbsync.markdown
+from nbsync.markdown import convert_code_block, convert_images, resolve_urls
+from nbsync.trace import NOOP
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from nbsync.markdown import Element
+    from nbsync.trace import Tracer
+
+Kind: TypeAlias = Literal["text", "comment", "code", "image"]
+Reach: TypeAlias = Literal["", "block", "comment", "end"]
+
+
+@dataclass(frozen=True)
+class Item:
+    """A top-level element of a page with its converted elements.
+
+    `reach` is how far a pattern that failed to match in the item may
+    read ahead: up to the next code block or comment, up to the next
+    comment, or up to the end of the text.
+    """
+
+    text: str
+    kind: Kind
+    elems: list[Element]
+    reach: Reach = ""
+
+
+@dataclass(frozen=True)
+class Page:
+    text: str
+    elems: list[Element]
+    items: list[Item] = field(default_factory=list)
+    starts: list[int] = field(default_factory=list)
+    restarts: list[int] = field(default_factory=list)
+    """The indices of the items where parsing can restart."""
+
+
+class Parser:
+    """Parse pages, reusing the elements of a page whose text is unchanged.
+
+    The elements are cached by a hash of the text, and each call returns
+    fresh copies of the images and code blocks, since they are modified
+    while the page is converted. The least recently used pages are dropped
+    when the total length of their texts exceeds `max_bytes`.
+
+    If `incremental` is True, a page with a source URI is parsed again
+    only from the first change to its previous text, and the elements
+    after the change are reused from the previous text where the parsing
+    of both texts is known to agree.
+    """
+
+    max_bytes: int
+    entries: OrderedDict[bytes, Page]
+    pages: dict[str, bytes]
+    nbytes: int
+    tracer: Tracer
+    incremental: bool
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 2**20,
+        tracer: Tracer = NOOP,
+        *,
+        incremental: bool = False,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.tracer = tracer
+        self.incremental = incremental
+        self.entries = OrderedDict()
+        self.pages = {}
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    def parse(self, text: str, src_uri: str | None = None) -> list[Element]:
+        key = get_key(text)
+        base = None
+
+        with self._lock:
+            if src_uri is not None:
+                base = self.entries.get(self.pages.get(src_uri, b""))
+                self.pages[src_uri] = key
+
+            if page := self.entries.get(key):
+                self.entries.move_to_end(key)
+                self.tracer.count("parse.hit")
+                return [copy_element(elem) for elem in page.elems]
+
+        if self.incremental:
+            if base is not None and base.items:
+                items = reparse(base, text)
+            else:
+                items = list(iter_items(text))
+            elems = convert_items(items)
+            starts = list(accumulate((len(x.text) for x in items), initial=0))
+            restarts = list(get_restarts(items, starts))
+            page = Page(text, [copy_element(e) for e in elems], items, starts, restarts)
+
+        else:
+            elems = list(nbsync.markdown.parse(text))
+            page = Page(text, [copy_element(e) for e in elems])
+
+        with self._lock:
+            self.discard(key)
+            self.entries[key] = page
+            self.nbytes += len(text)
+
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                self.discard(next(iter(self.entries)))
+
+        return elems
+
+    def discard(self, key: bytes) -> None:
+        if page := self.entries.pop(key, None):
+            self.nbytes -= len(page.text)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.pages.clear()
+            self.nbytes = 0
+
+
+def get_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def copy_element(elem: Element) -> Element:
+    """Return a copy of the element that can be modified independently."""
+    if not isinstance(elem, Image | CodeBlock):
+        return elem
+
+    clone = object.__new__(type(elem))
+    clone.__dict__.update(elem.__dict__)
+    clone.classes = list(elem.classes)
+    clone.attributes = dict(elem.attributes)
+    return clone
+
+
+def iter_items(text: str, pos: int = 0) -> Iterator[Item]:
+    """Parse the text from the position into items."""
+    for elem in nbstore.markdown.parse(text, pos):
+        if isinstance(elem, str):
+            if is_comment(elem):
+                yield Item(elem, "comment", [elem])
+            else:
+                yield Item(elem, "text", [elem], get_text_reach(elem))
+
+        elif isinstance(elem, CodeBlock):
+            reach = get_code_reach(elem.text)
+            yield Item(elem.text, "code", list(convert_code_block(elem)), reach)
+
+        else:
+            yield Item(elem.text, "image", [elem], get_image_reach(elem.text))
+
+
+def is_comment(text: str) -> bool:
+    return len(text) >= len("<!---->") and text[:4] == "<!--" and text[-3:] == "-->"
+
+
+def convert_items(items: list[Item]) -> list[Element]:
+    elems = (copy_element(elem) for item in items for elem in item.elems)
+    return list(convert_images(resolve_urls(elems)))
+
+
+FENCE_LINE_PATTERN = re.compile(r"^ *[~`]{3,}", re.MULTILINE)
+FENCE_PATTERN = re.compile(r" *[~`]+")
+
+
+def get_text_reach(text: str) -> Reach:
+    """Return how far an unclosed comment, fence, or `![` may read ahead."""
+    if "<!--" in text:
+        return "end"
+
+    if FENCE_LINE_PATTERN.search(text):
+        return "comment"
+
+    return "block" if "![" in text else ""
+
+
+def get_code_reach(text: str) -> Reach:
+    """Return how far the failed attempts to match the code block may read.
+
+    A fence longer than the one that closed the code block was tried first,
+    and may be closed anywhere before the next comment.
+    """
+    if "<!--" in text:
+        return "end"
+
+    fence = FENCE_PATTERN.match(text)
+    closing = text.rsplit("\n", 1)[-1]
+    return "comment" if fence and len(fence[0]) > len(closing) else ""
+
+
+def get_image_reach(text: str) -> Reach:
+    """Return how far the failed attempts to match the image may read.
+
+    An image with more than one `](` or `){` matched after shorter
+    attempts failed, which may match text up to the next code block.
+    """
+    if "<!--" in text:
+        return "end"
+
+    if FENCE_LINE_PATTERN.search(text):
+        return "comment"
+
+    return "block" if text.count("](") > 1 or text.count("){") > 1 else ""
+
+
+def get_restarts(items: list[Item], starts: list[int]) -> Iterator[int]:
+    """Yield the indices of the text items where parsing can restart.
+
+    Parsing from the start of a text item gives the same elements as
+    parsing the whole text, unless a pattern that failed to match before
+    the item could match text after it.
+    """
+    length = starts[-1]
+    next_comment = next_block = length
+    ends: list[int] = []
+
+    for item, start in zip(reversed(items), reversed(starts[:-1]), strict=True):
+        if item.reach == "block":
+            ends.append(next_block)
+        elif item.reach == "comment":
+            ends.append(next_comment)
+        elif item.reach == "end":
+            ends.append(length + 1)
+        else:
+            ends.append(0)
+
+        if item.kind == "comment":
+            next_comment = next_block = start
+        elif item.kind == "code":
+            next_block = start
+
+    blocked = 0
+
+    for index, (item, start, end) in enumerate(
+        zip(items, starts, reversed(ends), strict=False),
+    ):
+        if item.kind == "text" and item.text and start >= blocked:
+            yield index
+
+        blocked = max(blocked, end)
+
+
+def reparse(base: Page, text: str) -> list[Item]:
+    """Parse the text, reusing the items of the previous text of the page.
+
+    Parsing restarts at the last item that can be restarted before the
+    first change, and stops when it reaches a text item after the last
+    change that starts at the same place in the previous text. The items
+    of the previous text are reused before and after the change.
+    """
+    prefix = get_common_prefix(base.text, text)
+    size = min(len(base.text), len(text)) - prefix
+    suffix = get_common_prefix(base.text[::-1], text[::-1], size)
+
+    starts = base.starts
+    k = bisect.bisect_left(base.restarts, prefix, key=starts.__getitem__) - 1
+    index = base.restarts[k] if k >= 0 else 0
+
+    delta = len(text) - len(base.text)
+    boundary = len(text) - suffix
+
+    items = base.items[:index]
+    pos = starts[index]
+
+    for item in iter_items(text, pos):
+        if item.kind == "text" and item.text and pos > boundary:
+            k = bisect.bisect_left(starts, pos - delta)
+            if (
+                k < len(base.items)
+                and starts[k] == pos - delta
+                and base.items[k].kind == "text"
+            ):
+                items.extend(base.items[k:])
+                return items
+
+        items.append(item)
+        pos += len(item.text)
+
+    return items
+
+
+def get_common_prefix(a: str, b: str, size: int | None = None) -> int:
+    """Return the length of the common prefix of the strings."""
+    size = min(len(a), len(b)) if size is None else size
+    if a[:size] == b[:size]:
+        return size
+
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+
+    return lo
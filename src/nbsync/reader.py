@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from nbsync.trace import NOOP
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from nbformat import NotebookNode
+    from nbstore import Store
+
+    from nbsync.trace import Tracer
+
+
+class Reader:
+    """Read notebooks through the store, bounding the notebooks it keeps.
+
+    `Store.read` parses a file again only when its modification time
+    changes. The reader also reloads a file whose size has changed, and
+    drops the least recently used notebooks from the store when the total
+    size of their files exceeds `max_bytes`.
+    """
+
+    store: Store
+    max_bytes: int
+    entries: OrderedDict[Path, int]
+    nbytes: int
+    tracer: Tracer
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        store: Store,
+        max_bytes: int = 256 * 2**20,
+        tracer: Tracer = NOOP,
+    ) -> None:
+        self.store = store
+        self.max_bytes = max_bytes
+        self.tracer = tracer
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    def read(self, url: str) -> NotebookNode:
+        path = self.store.find_path(url)
+        size = path.stat().st_size
+
+        with self._lock:
+            if self.entries.get(path, size) != size:
+                self.store.st_mtime.pop(path, None)
+
+            cached = self.store.nodes.get(path)
+            with self.tracer.span("read", url=url):
+                nb = self.store.read(url)
+
+            if nb is cached:
+                self.tracer.count("read.hit")
+
+            self.nbytes += size - self.entries.pop(path, 0)
+            self.entries[path] = size
+
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                self.discard(next(iter(self.entries)))
+
+        return nb
+
+    def discard(self, path: Path) -> None:
+        """Drop the notebook of the path from the reader and the store."""
+        if (size := self.entries.pop(path, None)) is not None:
+            self.nbytes -= size
+            self.store.nodes.pop(path, None)
+            self.store.st_mtime.pop(path, None)
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import re
 import textwrap
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, TypeVar
 
 import nbformat
 from nbstore.markdown import CodeBlock, Image
@@ -12,78 +15,564 @@ from nbstore.notebook import get_language, get_mime_content, get_source
 
 import nbsync.markdown
 from nbsync import logger
+from nbsync.asset import get_asset
 from nbsync.cell import Cell
-from nbsync.markdown import is_truelike
-from nbsync.notebook import Notebook
+from nbsync.console import get_metadata, is_console
+from nbsync.index import Index
+from nbsync.kernel import Kernel, KernelPool
+from nbsync.limits import Limits
+from nbsync.markdown import SOURCE, is_truelike, strip_attributes
+from nbsync.notebook import Notebook, Notebooks
+from nbsync.parser import Parser
+from nbsync.reader import Reader
+from nbsync.trace import NOOP, Tracer
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    import asyncio
+    from collections.abc import (
+        AsyncIterator,
+        Awaitable,
+        Callable,
+        Iterable,
+        Iterator,
+        Mapping,
+    )
 
     from nbformat import NotebookNode
     from nbstore import Store
 
+    from nbsync.asset import Asset, AssetStore
+    from nbsync.cache import Cache
+    from nbsync.markdown import Element
+    from nbsync.timing import TimingReport
+
+T = TypeVar("T")
+
 
 @dataclass
 class Synchronizer:
     store: Store
-    notebooks: dict[str, Notebook] = field(default_factory=dict, init=False)
-
-    def parse(self, text: str) -> Iterator[str | Image | CodeBlock]:
+    notebooks: Notebooks = field(init=False)
+    cache: Cache | None = None
+    workers: int = 1
+    incremental: bool = False
+    max_kernels: int = 8
+    kernels: dict[str, Kernel] = field(default_factory=dict, init=False)
+    busy: Counter[str] = field(default_factory=Counter, init=False)
+    kernel_pool: KernelPool | None = None
+    max_read_bytes: int = 256 * 2**20
+    reader: Reader = field(init=False)
+    max_parse_bytes: int = 64 * 2**20
+    incremental_parse: bool = False
+    max_notebooks: int | None = None
+    max_output_bytes: int | None = None
+    index: Index = field(default_factory=Index, init=False)
+    markdown: dict[str, Notebook] = field(default_factory=dict, init=False)
+    parser: Parser = field(init=False)
+    timing: TimingReport | None = None
+    tracer: Tracer = NOOP
+    assets: AssetStore | None = None
+    limits: Limits = field(default_factory=Limits)
+    tasks: dict[int, asyncio.Future[float | None]] = field(
+        default_factory=dict,
+        init=False,
+    )
+    limiter: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = field(
+        default=None,
+        init=False,
+        repr=False,
+    )
+
+    def __post_init__(self) -> None:
+        self.notebooks = Notebooks(self.max_notebooks, self.max_output_bytes)
+        self.reader = Reader(self.store, self.max_read_bytes, self.tracer)
+        self.parser = Parser(
+            self.max_parse_bytes,
+            self.tracer,
+            incremental=self.incremental_parse,
+        )
+
+    def parse(
+        self,
+        text: str,
+        src_uri: str | None = None,
+    ) -> Iterator[str | Image | CodeBlock]:
+        with self.tracer.span("parse"):
+            yield from self.collect(self.parser.parse(text, src_uri), src_uri)
+
+    def collect(
+        self,
+        elems: Iterable[Element],
+        src_uri: str | None = None,
+    ) -> Iterator[Element]:
+        """Yield the elements of a page while building its notebooks.
+
+        The notebooks are updated once all elements have been yielded.
+        """
         notebooks: dict[str, Notebook] = {}
+        urls: set[str] = set()
 
-        for elem in nbsync.markdown.parse(text):
+        for url in self.notebooks.evict():
+            logger.debug(f"{url!r} evicted")
+            self.tracer.count("notebook.evicted", url=url)
+            if url == ".md":
+                self.markdown.clear()
+
+        for elem in elems:
             yield elem
 
             if isinstance(elem, Image | CodeBlock):
-                update_notebooks(elem, notebooks, self.store)
+                update_notebooks(elem, notebooks, self.reader)
+                if elem.url != ".md":
+                    urls.add(elem.url)
 
         for url, notebook in notebooks.items():
-            if url not in self.notebooks or not self.notebooks[url].equals(notebook):
-                self.notebooks[url] = notebook
+            current = self.notebooks.get(url)
+            if url == ".md" and src_uri is not None:
+                current = self.markdown.get(src_uri, current)
 
-    def execute(self, src_uri: str | None = None) -> None:
-        for url, notebook in self.notebooks.items():
-            if not notebook.execution_needed:
+            if current is not None and current.equals(notebook):
+                self.notebooks[url] = current
                 continue
 
-            if url == ".md":
-                path = src_uri or ".md"
+            if current is None and self.notebooks.was_executed(url, notebook):
+                notebook.set_execution_needed()
+            self.notebooks[url] = notebook
+
+        if src_uri is not None:
+            if ".md" in notebooks:
+                self.markdown[src_uri] = self.notebooks[".md"]
             else:
-                url_path = self.store.find_path(url)
-                if url_path.is_relative_to(Path.cwd()):
-                    path = str(url_path.relative_to(Path.cwd()))
-                else:
-                    path = str(url_path)
+                self.markdown.pop(src_uri, None)
+
+            self.index.update(src_uri, urls)
+
+    def dirty_pages(self, paths: Iterable[str | Path]) -> set[str]:
+        """Return the source URIs of the pages to convert again.
+
+        The pages are those that referenced any of the changed files
+        when they were last parsed with their source URI.
+        """
+        urls = self.index.find_urls(self.store, paths)
+        return self.index.get_pages(urls)
+
+    def execute(self, src_uri: str | None = None) -> None:
+        notebooks = [
+            (url, notebook, src_uri)
+            for url, notebook in self.notebooks.items()
+            if notebook.execution_needed
+        ]
+        self._execute(notebooks)
+
+    def _execute(self, notebooks: list[tuple[str, Notebook, str | None]]) -> None:
+        executions: list[
+            tuple[str, Notebook, Callable[[], float | None], str | None]
+        ] = []
+
+        for url, notebook, src_uri in notebooks:
+            path = self.get_path(url, src_uri)
+            kernel = self.get_kernel(path)
+            pool = self.kernel_pool if url == ".md" else None
+            func = partial(self.execute_notebook, path, notebook, kernel, pool)
+            executions.append((path, notebook, func, src_uri))
+
+        try:
+            if self.workers > 1 and len(executions) > 1:
+                with ThreadPoolExecutor(self.workers) as executor:
+                    futures = [
+                        (path, notebook, executor.submit(func), src_uri)
+                        for path, notebook, func, src_uri in executions
+                    ]
+                    try:
+                        for path, notebook, future, src_uri in futures:
+                            self.report(path, notebook, future.result, src_uri)
+                    except SystemExit:
+                        executor.shutdown(cancel_futures=True)
+                        raise
 
-            try:
-                elapsed = notebook.execute()
-            except Exception as e:  # noqa: BLE001
-                if src_uri and src_uri != path:
-                    msg = f"Error reading page {src_uri!r}: "
-                else:
-                    msg = ""
-                msg = f"{msg}Error executing notebook {path!r}: {e}"
-                logger.error(msg)
-                raise SystemExit(1) from None
             else:
-                logger.info(f"{path!r} executed in {elapsed:.2f} seconds")
+                for path, notebook, func, src_uri in executions:
+                    self.report(path, notebook, func, src_uri)
+
+        finally:
+            self.trim_kernels()
+
+    def report(
+        self,
+        path: str,
+        notebook: Notebook,
+        func: Callable[[], float | None],
+        src_uri: str | None = None,
+    ) -> None:
+        if (elapsed := report(path, func, src_uri)) is None:
+            self.tracer.count("cache.hit", path=path)
+            return
+
+        self.tracer.count("notebook.executed", path=path)
+        if self.tracer.enabled:
+            self.tracer.count("output.bytes", notebook.output_bytes, path=path)
+        if self.timing is not None:
+            self.timing.add(path, notebook.nb, elapsed)
+
+    def execute_notebook(
+        self,
+        path: str,
+        notebook: Notebook,
+        kernel: Kernel | None = None,
+        pool: KernelPool | None = None,
+    ) -> float | None:
+        with self.tracer.span("execute", path=path):
+            elapsed = execute(notebook, self.cache, kernel, pool, self.limits)
+
+        if self.assets:
+            self.assets.spill(notebook.nb)
+
+        return elapsed
+
+    async def aexecute_notebook(
+        self,
+        path: str,
+        notebook: Notebook,
+        kernel: Kernel | None = None,
+        pool: KernelPool | None = None,
+    ) -> float | None:
+        import asyncio
+
+        with self.tracer.span("execute", path=path):
+            elapsed = await aexecute(notebook, self.cache, kernel, pool, self.limits)
+
+        if self.assets:
+            await asyncio.to_thread(self.assets.spill, notebook.nb)
+
+        return elapsed
+
+    async def aexecute(self, src_uri: str | None = None) -> None:
+        """Execute the notebooks like `execute`, without blocking the event loop."""
+        notebooks = [
+            (url, notebook, src_uri)
+            for url, notebook in self.notebooks.items()
+            if notebook.execution_needed
+        ]
+        await self._aexecute(notebooks)
+
+    async def _aexecute(
+        self,
+        notebooks: list[tuple[str, Notebook, str | None]],
+    ) -> None:
+        import asyncio
+
+        semaphore = self.get_limiter()
+
+        async def run(
+            path: str,
+            func: Callable[[], Awaitable[float | None]],
+        ) -> float | None:
+            self.busy[path] += 1
+            try:
+                async with semaphore:
+                    return await func()
+            finally:
+                self.busy[path] -= 1
+                if not self.busy[path]:
+                    del self.busy[path]
+
+        executions: list[tuple[str, Notebook, Awaitable[float | None], str | None]] = []
+        owners: list[bool] = []
+        keys: list[int] = []
+
+        for url, notebook, src_uri in notebooks:
+            path = self.get_path(url, src_uri)
+
+            task = self.tasks.get(key := id(notebook))
+            if owner := task is None:
+                kernel = self.get_kernel(path)
+                pool = self.kernel_pool if url == ".md" else None
+                func = partial(self.aexecute_notebook, path, notebook, kernel, pool)
+                self.tasks[key] = task = asyncio.ensure_future(run(path, func))
+                keys.append(key)
+
+            executions.append((path, notebook, asyncio.shield(task), src_uri))
+            owners.append(owner)
+
+        try:
+            results = await asyncio.gather(
+                *(awaitable for _, _, awaitable, _ in executions),
+                return_exceptions=True,
+            )
+        finally:
+            for key in keys:
+                self.tasks.pop(key, None)
+            self.trim_kernels()
+
+        # A notebook shared with another page is reported by that page,
+        # unless its execution failed.
+        for execution, owner, result in zip(executions, owners, results, strict=True):
+            if owner or isinstance(result, BaseException):
+                path, notebook, _, src_uri = execution
+                self.report(path, notebook, partial(unwrap, result), src_uri)
+
+    def get_limiter(self) -> asyncio.Semaphore:
+        """Return the semaphore that bounds the notebooks executed at once.
+
+        It is shared by all the calls in the running event loop, so that
+        concurrent `aconvert` calls run at most `workers` notebooks.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self.limiter is None or self.limiter[0] is not loop:
+            self.limiter = (loop, asyncio.Semaphore(max(self.workers, 1)))
+
+        return self.limiter[1]
+
+    def get_kernel(self, path: str) -> Kernel | None:
+        """Return the live kernel of the notebook for incremental execution."""
+        if not self.incremental:
+            return None
+
+        kernel = self.kernels.pop(path, None) or Kernel(limits=self.limits)
+        self.kernels[path] = kernel
+        return kernel
+
+    def trim_kernels(self) -> None:
+        """Shut down the least recently used kernels over `max_kernels`.
+
+        The kernels are trimmed after the notebooks are executed, so that
+        a kernel is never shut down before or while it runs a notebook.
+        """
+        for path in list(self.kernels):
+            if len(self.kernels) <= self.max_kernels:
+                return
+
+            if not self.busy[path]:
+                self.kernels.pop(path).shutdown()
+
+    def get_path(self, url: str, src_uri: str | None = None) -> str:
+        if url == ".md":
+            return src_uri or ".md"
+
+        path = self.store.find_path(url)
+        if path.is_relative_to(Path.cwd()):
+            return str(path.relative_to(Path.cwd()))
+
+        return str(path)
 
     def convert(self, text: str, src_uri: str | None = None) -> Iterator[str | Cell]:
-        elems = list(self.parse(text))
+        elems = list(self.parse(text, src_uri))
         self.execute(src_uri)
 
-        for elem in elems:
+        yield from convert_elements(elems, self.notebooks, self.tracer)
+
+    async def aconvert(
+        self,
+        text: str,
+        src_uri: str | None = None,
+    ) -> AsyncIterator[str | Cell]:
+        """Convert the page like `convert`, without blocking the event loop.
+
+        Only the notebooks of this page are executed, so that other pages
+        can be converted concurrently. A notebook that is being executed
+        for another page is awaited instead of being executed again.
+        """
+        elems = list(self.parse(text, src_uri))
+        notebooks = self.select(elems)
+        await self._aexecute(
+            [(u, nb, src_uri) for u, nb in notebooks.items() if nb.execution_needed],
+        )
+
+        for elem in convert_elements(elems, notebooks, self.tracer):
+            yield elem
+
+    def select(self, elems: Iterable[Element]) -> dict[str, Notebook]:
+        """Return the notebooks referenced by the elements of a page."""
+        urls = {e.url for e in elems if isinstance(e, Image | CodeBlock)}
+        return {u: self.notebooks[u] for u in urls if u in self.notebooks}
+
+    def convert_stream(
+        self,
+        text: str,
+        src_uri: str | None = None,
+    ) -> Iterator[str | Cell]:
+        """Convert the page while streaming the elements.
+
+        Unlike `convert`, the parsed elements are not kept in memory,
+        and the page is not cached by the parser. The page is parsed once
+        to build the notebooks, and then parsed again while the elements
+        are yielded. Each notebook is executed only when the first image
+        that needs its outputs is reached, so the leading text is yielded
+        before any execution.
+        """
+        with self.tracer.span("parse"):
+            for _ in self.collect(nbsync.markdown.parse(text), src_uri):
+                pass
+
+        urls: set[str] = set()
+
+        for elem in nbsync.markdown.parse(text):
             if isinstance(elem, str):
                 yield elem
+                continue
+
+            elem.attributes.pop("exec", None)
+
+            if isinstance(elem, Image) and elem.url not in urls:
+                urls.add(elem.url)
+                notebook = self.notebooks.get(elem.url)
+                if notebook and notebook.execution_needed:
+                    self._execute([(elem.url, notebook, src_uri)])
 
-            elif cell := convert(elem, self.notebooks):
+            if cell := convert_element(elem, self.notebooks, self.tracer):
                 yield cell
 
+    def convert_pages(
+        self,
+        pages: Iterable[tuple[str, str | None]],
+    ) -> Iterator[tuple[str | None, Iterator[str | Cell]]]:
+        """Convert many pages at once.
+
+        All pages are parsed first, so that a notebook referenced from
+        several pages is executed only once, and independent notebooks
+        are executed together on the worker pool before any page is
+        converted.
+
+        Args:
+            pages: Pairs of the page text and its source URI.
+
+        Yields:
+            Pairs of the source URI and the converted elements of the page.
+        """
+        for src_uri, elems, notebooks in self.prepare(pages):
+            yield src_uri, convert_elements(elems, notebooks, self.tracer)
+
+    def prepare(
+        self,
+        pages: Iterable[tuple[str, str | None]],
+    ) -> list[tuple[str | None, list[Element], dict[str, Notebook]]]:
+        """Parse the pages and execute their notebooks.
+
+        Returns:
+            Tuples of the source URI, the elements, and the notebooks of
+            each page.
+        """
+        parsed: list[tuple[str | None, list[Element], dict[str, Notebook]]] = []
+        executions: dict[int, tuple[str, Notebook, str | None]] = {}
+
+        for text, src_uri in pages:
+            elems = list(self.parse(text, src_uri))
+            notebooks = self.select(elems)
+            parsed.append((src_uri, elems, notebooks))
+
+            for url, notebook in notebooks.items():
+                if notebook.execution_needed and id(notebook) not in executions:
+                    executions[id(notebook)] = (url, notebook, src_uri)
+
+        self._execute(list(executions.values()))
+        return parsed
+
+
+def execute(
+    notebook: Notebook,
+    cache: Cache | None = None,
+    kernel: Kernel | None = None,
+    pool: KernelPool | None = None,
+    limits: Limits | None = None,
+) -> float | None:
+    """Execute the notebook, or restore its outputs from the cache.
+
+    If no kernel is given, a kernel is leased from the pool if any.
+    Return the elapsed time, or None if the outputs were restored.
+    """
+    if cache and notebook.restore(cache):
+        return None
+
+    if kernel or not pool or is_console(notebook.nb):
+        return notebook.execute(cache, kernel, limits)
+
+    kernel = pool.acquire()
+    try:
+        return notebook.execute(cache, kernel, limits)
+    finally:
+        pool.release(kernel)
+
+
+async def aexecute(
+    notebook: Notebook,
+    cache: Cache | None = None,
+    kernel: Kernel | None = None,
+    pool: KernelPool | None = None,
+    limits: Limits | None = None,
+) -> float | None:
+    """Execute the notebook like `execute`, without blocking the event loop.
+
+    Live kernels are synchronous, so notebooks that run in a given or
+    leased kernel are executed in a worker thread.
+    """
+    if kernel or (pool and not is_console(notebook.nb)):
+        import asyncio
+
+        args = (notebook, cache, kernel, pool, limits)
+        return await asyncio.to_thread(execute, *args)
+
+    if cache and notebook.restore(cache):
+        return None
+
+    return await notebook.aexecute(cache, limits)
+
+
+def unwrap(result: T | BaseException) -> T:
+    if isinstance(result, BaseException):
+        raise result
+
+    return result
+
+
+def report(
+    path: str,
+    func: Callable[[], float | None],
+    src_uri: str | None = None,
+) -> float | None:
+    try:
+        elapsed = func()
+    except Exception as e:  # noqa: BLE001
+        msg = f"Error reading page {src_uri!r}: " if src_uri and src_uri != path else ""
+        msg = f"{msg}Error executing notebook {path!r}: {e}"
+        logger.error(msg)
+        raise SystemExit(1) from None
+
+    if elapsed is None:
+        logger.info(f"{path!r} restored from cache")
+    else:
+        logger.info(f"{path!r} executed in {elapsed:.2f} seconds")
+
+    return elapsed
+
+
+def convert_elements(
+    elems: Iterable[Element],
+    notebooks: Mapping[str, Notebook],
+    tracer: Tracer = NOOP,
+) -> Iterator[str | Cell]:
+    for elem in elems:
+        if isinstance(elem, str):
+            yield elem
+
+        elif cell := convert_element(elem, notebooks, tracer):
+            yield cell
+
+
+def convert_element(
+    elem: Image | CodeBlock,
+    notebooks: Mapping[str, Notebook],
+    tracer: Tracer = NOOP,
+) -> str | Cell:
+    with tracer.span("convert", url=elem.url, identifier=elem.identifier):
+        return convert(elem, notebooks)
+
 
 def update_notebooks(
     elem: Image | CodeBlock,
     notebooks: dict[str, Notebook],
-    store: Store,
+    store: Store | Reader,
 ) -> None:
     url = elem.url
 
@@ -104,12 +593,31 @@ def update_notebooks(
 
     if isinstance(elem, CodeBlock):
         source = textwrap.dedent(elem.source)
-        notebook.add_cell(elem.identifier, source)
+        if "console" in elem.classes:
+            command = elem.attributes.get("command", "")
+            metadata = get_metadata(command, elem.attributes.get("workdir"))
+        else:
+            metadata = {}
+        if (timeout := get_timeout(elem)) is not None:
+            metadata.setdefault("nbsync", {})["timeout"] = timeout
+        notebook.add_cell(elem.identifier, source, metadata)
+
+
+def get_timeout(elem: CodeBlock) -> float | None:
+    """Return the value of the `timeout` attribute of the code block."""
+    if (timeout := elem.attributes.get("timeout")) is None:
+        return None
+
+    try:
+        return float(timeout)
+    except ValueError:
+        logger.warning(f"Invalid timeout: {timeout!r}")
+        return None
 
 
 def convert(
     elem: Image | CodeBlock,
-    notebooks: dict[str, Notebook],
+    notebooks: Mapping[str, Notebook],
 ) -> str | Cell:
     if elem.identifier not in [".", "_"] or "source" in elem.attributes:
         if isinstance(elem, Image):
@@ -117,7 +625,7 @@ def convert(
                 logger.warning(f"Notebook not found: {elem.url}")
                 return ""
 
-            nb = notebooks[elem.url].nb
+            nb = notebooks[elem.url].select(elem.identifier)
 
             if "console" in elem.classes:
                 return convert_console(elem, nb)
@@ -130,20 +638,28 @@ def convert(
 
 
 def convert_image(image: Image, nb: NotebookNode) -> Cell:
+    content: bytes | str | Asset
+
     try:
         image.source = get_source(nb, image.identifier)
-        mime_content = get_mime_content(nb, image.identifier)
+        if asset := get_asset(nb, image.identifier):
+            mime, content = asset.mime, asset
+        else:
+            mime, content = get_mime_content(nb, image.identifier)
     except ValueError:
         cell = f"{image.url}#{image.identifier}"
         logger.warning(f"Error reading cell: {cell!r}")
         image.source = ""
-        mime_content = ("", "")
+        mime, content = "", ""
+
+    return Cell(image, get_language(nb), mime, content)
+
 
-    return Cell(image, get_language(nb), *mime_content)
+ANSI_PATTERN = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
 
 
 def remove_ansi(text: str) -> str:
-    return re.sub(r"\x1B\[[0-?]*[ -/]*[@-~]", "", text)
+    return ANSI_PATTERN.sub("", text)
 
 
 def convert_console(image: Image, nb: NotebookNode) -> str:
@@ -167,9 +683,6 @@ def convert_code_block(code_block: CodeBlock) -> str:
 
     lines = code_block.text.splitlines()
     if lines:
-        pattern = f"\\S+#{code_block.identifier}"
-        lines[0] = re.sub(pattern, "", lines[0])
-        pattern = r"source=[^\s}]+"
-        lines[0] = re.sub(pattern, "", lines[0])
+        lines[0] = strip_attributes(lines[0], SOURCE, code_block.identifier)
 
     return "\n".join(lines)
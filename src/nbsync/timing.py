@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from nbsync.notebook import get_identifier, get_output_bytes
+
+if TYPE_CHECKING:
+    from nbformat import NotebookNode
+
+
+@dataclass(frozen=True)
+class CellTiming:
+    """The execution timing of a cell.
+
+    `queue` is the time from the kernel picking up the request to the
+    start of the code, and `wall` is the time from the start of the code
+    to the reply of the kernel.
+    """
+
+    path: str
+    index: int
+    identifier: str
+    wall: float
+    queue: float
+    output_bytes: int
+
+
+@dataclass(frozen=True)
+class NotebookTiming:
+    path: str
+    elapsed: float
+    cells: int
+
+
+@dataclass
+class TimingReport:
+    """The timings of the notebooks and cells executed across a build."""
+
+    notebooks: list[NotebookTiming] = field(default_factory=list)
+    cells: list[CellTiming] = field(default_factory=list)
+
+    def add(self, path: str, nb: NotebookNode, elapsed: float) -> None:
+        cells = get_cell_timings(nb, path)
+        self.notebooks.append(NotebookTiming(path, elapsed, len(cells)))
+        self.cells.extend(cells)
+
+    def clear(self) -> None:
+        self.notebooks.clear()
+        self.cells.clear()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "notebooks": [asdict(x) for x in self.notebooks],
+            "cells": [asdict(x) for x in self.cells],
+        }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def summary(self, limit: int = 10) -> str:
+        """Return a text summary of the slowest notebooks and cells."""
+        notebooks = sorted(self.notebooks, key=lambda x: x.elapsed, reverse=True)
+        cells = sorted(self.cells, key=lambda x: x.wall, reverse=True)
+
+        lines = [f"Slowest notebooks ({len(notebooks)} executed):"]
+        lines.extend(
+            f"  {x.elapsed:8.2f}s  {x.path} ({x.cells} cells)"
+            for x in notebooks[:limit]
+        )
+        lines.append(f"Slowest cells ({len(cells)} executed):")
+        for x in cells[:limit]:
+            queue = f"queue {x.queue:.3f}s, {format_bytes(x.output_bytes)}"
+            lines.append(f"  {x.wall:8.2f}s  {x.path} {format_cell(x)} ({queue})")
+        return "\n".join(lines)
+
+
+def get_cell_timings(nb: NotebookNode, path: str) -> list[CellTiming]:
+    """Return the timings of the cells executed in the notebook.
+
+    The timings are read from the `execution` metadata recorded by the
+    notebook client. Cells without it, such as cells whose outputs are
+    reused, are skipped.
+    """
+    timings: list[CellTiming] = []
+
+    for index, cell in enumerate(nb["cells"]):
+        execution = cell.get("metadata", {}).get("execution", {})
+        try:
+            busy = parse_timestamp(execution["iopub.status.busy"])
+            start = parse_timestamp(execution["iopub.execute_input"])
+            end = parse_timestamp(execution["shell.execute_reply"])
+        except (KeyError, ValueError):
+            continue
+
+        identifier = get_identifier(cell) or ""
+        size = get_output_bytes(cell)
+        timing = CellTiming(path, index, identifier, end - start, start - busy, size)
+        timings.append(timing)
+
+    return timings
+
+
+def parse_timestamp(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+
+
+def format_cell(timing: CellTiming) -> str:
+    if timing.identifier:
+        return f"#{timing.identifier}"
+
+    return f"[{timing.index}]"
+
+
+def format_bytes(size: int) -> str:
+    if size < 1024:  # noqa: PLR2004
+        return f"{size} B"
+
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} kB"
+
+    return f"{size / 1024 / 1024:.1f} MB"
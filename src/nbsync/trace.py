@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from typing_extensions import override
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from contextlib import AbstractContextManager
+
+
+class Tracer:
+    """The hooks called around the steps of the synchronization.
+
+    The default implementation does nothing. Subclasses may override
+    `span` and `count` to forward durations and counters to a collector.
+    Both may be called from worker threads.
+
+    The spans are `parse`, `read`, `execute`, and `convert`. The counters
+    are `read.hit`, `parse.hit`, `cache.hit`, `notebook.executed`,
+    `notebook.evicted`, and `output.bytes`.
+
+    Counters that are costly to compute are only counted if `enabled`
+    is True, which subclasses set when they record anything.
+    """
+
+    enabled: ClassVar[bool] = False
+
+    def span(self, name: str, **attributes: Any) -> AbstractContextManager[None]:
+        """Return a context manager that measures a step."""
+        del name, attributes
+        return nullcontext()
+
+    def count(self, name: str, value: int = 1, **attributes: Any) -> None:
+        """Add the value to a counter."""
+        del name, value, attributes
+
+
+NOOP = Tracer()
+"""The tracer that does nothing."""
+
+
+@dataclass(frozen=True)
+class Span:
+    name: str
+    attributes: dict[str, Any]
+    duration: float
+
+
+@dataclass
+class Recorder(Tracer):
+    """A tracer that keeps the spans and counters in memory."""
+
+    enabled: ClassVar[bool] = True
+    spans: list[Span] = field(default_factory=list)
+    counters: Counter[str] = field(default_factory=Counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @override
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            span = Span(name, attributes, time.perf_counter() - start)
+            with self._lock:
+                self.spans.append(span)
+
+    @override
+    def count(self, name: str, value: int = 1, **attributes: Any) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def durations(self) -> dict[str, float]:
+        """Return the total duration of the spans by name."""
+        durations: dict[str, float] = {}
+        for span in self.spans:
+            durations[span.name] = durations.get(span.name, 0) + span.duration
+        return durations
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from nbsync import logger
+from nbsync.index import iter_paths
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from nbsync.cell import Cell
+    from nbsync.sync import Synchronizer
+
+
+class Watcher:
+    """Execute the notebooks of changed files in the background.
+
+    The watcher polls the files of the notebooks referenced by the pages
+    converted through it, and the files of the pages themselves if
+    `docs_dir` is given. When a file changes, the pages that depend on it
+    are parsed again and their notebooks are executed, so that the outputs
+    are ready when the pages are converted next.
+
+    Pages must be converted with `convert`, which waits for a background
+    execution of their notebooks instead of starting another one.
+    """
+
+    sync: Synchronizer
+    interval: float
+    docs_dir: Path | None
+    texts: dict[str, str]
+    stats: dict[Path, tuple[int, int] | None]
+    lock: threading.Lock
+    _stop: threading.Event
+
+    def __init__(
+        self,
+        sync: Synchronizer,
+        interval: float = 1,
+        docs_dir: str | Path | None = None,
+    ) -> None:
+        self.sync = sync
+        self.interval = interval
+        self.docs_dir = None if docs_dir is None else Path(docs_dir)
+        self.texts = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def convert(self, text: str, src_uri: str) -> list[str | Cell]:
+        """Convert the page, and watch the files it depends on."""
+        with self.lock:
+            self.texts[src_uri] = text
+            elems = list(self.sync.convert(text, src_uri))
+
+        for path in self.iter_paths():
+            if path not in self.stats:
+                self.stats[path] = get_stat(path)
+
+        return elems
+
+    def iter_paths(self) -> Iterator[Path]:
+        """Yield the paths of the files to watch."""
+        for url in list(self.sync.index.notebooks):
+            yield from iter_paths(self.sync.store, url)
+
+        if self.docs_dir:
+            for src_uri in list(self.texts):
+                yield (self.docs_dir / src_uri).absolute()
+
+    def scan(self) -> list[Path]:
+        """Return the paths of the files changed since the last scan.
+
+        A file seen for the first time is not reported as changed.
+        """
+        changed: list[Path] = []
+
+        for path in self.iter_paths():
+            stat = get_stat(path)
+            if self.stats.setdefault(path, stat) != stat:
+                self.stats[path] = stat
+                changed.append(path)
+
+        return changed
+
+    def poll(self) -> set[str]:
+        """Prepare the pages that depend on the changed files.
+
+        Returns:
+            The source URIs of the prepared pages.
+        """
+        if not (changed := self.scan()):
+            return set()
+
+        src_uris = self.sync.dirty_pages(changed)
+
+        if self.docs_dir:
+            for src_uri in list(self.texts):
+                path = (self.docs_dir / src_uri).absolute()
+                if path in changed and (text := read_text(path)) is not None:
+                    self.texts[src_uri] = text
+                    src_uris.add(src_uri)
+
+        src_uris.intersection_update(self.texts)
+        if not src_uris:
+            return set()
+
+        logger.info(f"Preparing {len(src_uris)} page(s) after changes")
+
+        with self.lock:
+            pages = [(self.texts[src_uri], src_uri) for src_uri in sorted(src_uris)]
+            try:
+                self.sync.prepare(pages)
+            except SystemExit:
+                logger.warning("Execution failed; the pages are executed on request")
+
+        return src_uris
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:  # noqa: BLE001, PERF203
+                logger.error(f"Error watching files: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="nbsync-watch")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+def get_stat(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_text(path: Path) -> str | None:
+    try:
+        return path.read_text(encoding="utf-8")
+    except OSError:
+        return None
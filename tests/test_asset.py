@@ -0,0 +1,85 @@
+import base64
+from pathlib import Path
+
+import nbformat
+import pytest
+from nbformat import NotebookNode
+
+from nbsync.asset import AssetStore, get_asset, get_image_filename, is_binary
+
+# pyright: reportUnknownMemberType=false
+
+
+def new_notebook(data: dict[str, str]) -> NotebookNode:
+    cell = nbformat.v4.new_code_cell("# #fig\nplot()")
+    cell.outputs.append(nbformat.v4.new_output("display_data", data=data))
+    return nbformat.v4.new_notebook(cells=[cell])
+
+
+@pytest.mark.parametrize(
+    ("mime", "expected"),
+    [
+        ("image/png", True),
+        ("image/jpeg", True),
+        ("application/pdf", True),
+        ("image/svg+xml", False),
+        ("text/html", False),
+        ("text/plain", False),
+    ],
+)
+def test_is_binary(mime: str, expected: bool):
+    assert is_binary(mime) is expected
+
+
+def test_put(tmp_path: Path):
+    store = AssetStore(tmp_path / "assets")
+    asset = store.put("image/png", b"abc")
+    assert asset.path == tmp_path / "assets" / get_image_filename("image/png", b"abc")
+    assert asset.name == asset.path.name
+    assert asset.size == 3
+    assert asset.read_bytes() == b"abc"
+    assert store.put("image/png", b"abc") == asset
+    assert len(list(asset.path.parent.iterdir())) == 1
+
+
+def test_spill(tmp_path: Path):
+    png = base64.b64encode(b"png").decode()
+    nb = new_notebook({"image/png": png, "image/svg+xml": "<svg/>", "text/plain": "a"})
+    store = AssetStore(tmp_path)
+    assert store.spill(nb) == 1
+    data = nb.cells[0].outputs[0].data
+    assert data == {"image/png": "", "image/svg+xml": "<svg/>", "text/plain": "a"}
+
+    assert get_asset(nb, "fig") is None
+    assert store.spill(nb) == 0
+
+
+def test_get_asset(tmp_path: Path):
+    png = base64.b64encode(b"png").decode()
+    nb = new_notebook({"image/png": png, "text/plain": "a"})
+    AssetStore(tmp_path).spill(nb)
+    asset = get_asset(nb, "fig")
+    assert asset
+    assert asset.read_bytes() == b"png"
+    assert asset.mime == "image/png"
+
+
+@pytest.mark.parametrize(
+    ("mime", "text"),
+    [("text/plain", "<Figure>"), ("image/png", base64.b64encode(b"png").decode())],
+)
+def test_get_asset_pdf(tmp_path: Path, mime: str, text: str):
+    pdf = base64.b64encode(b"pdf").decode()
+    nb = new_notebook({"application/pdf": pdf, mime: text})
+    AssetStore(tmp_path).spill(nb)
+    asset = get_asset(nb, "fig")
+    assert asset
+    assert asset.mime == "application/pdf"
+    assert asset.read_bytes() == b"pdf"
+
+
+def test_get_asset_not_spilled():
+    nb = new_notebook({"image/png": base64.b64encode(b"png").decode()})
+    assert get_asset(nb, "fig") is None
+    nb = new_notebook({"text/plain": "a"})
+    assert get_asset(nb, "fig") is None
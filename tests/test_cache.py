@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import nbformat
+import nbstore.notebook
+import pytest
+from nbformat import NotebookNode
+
+from nbsync.cache import Cache, get_key, normalize_source
+
+# pyright: reportUnknownMemberType=false
+
+
+def new_notebook(*sources: str) -> NotebookNode:
+    nb = nbformat.v4.new_notebook()
+    for source in sources:
+        nb.cells.append(nbformat.v4.new_code_cell(source))
+    return nb
+
+
+@pytest.mark.parametrize("source", ["a\r\nb", "a\nb\n", ["a\n", "b"]])
+def test_normalize_source(source: str | list[str]):
+    assert normalize_source(source) == "a\nb"
+
+
+def test_get_key():
+    assert get_key(new_notebook("a")) == get_key(new_notebook("a\n"))
+    assert get_key(new_notebook("a")) != get_key(new_notebook("b"))
+    assert get_key(new_notebook("a")) != get_key(new_notebook("a", "b"))
+
+
+def test_get_key_kernel():
+    nb = new_notebook("a")
+    key = get_key(nb)
+    nb.metadata["kernelspec"] = {"name": "julia", "language": "julia"}
+    assert get_key(nb) != key
+
+
+def test_get_key_ignores_outputs():
+    nb = new_notebook("# #id\nprint(1)")
+    key = get_key(nb)
+    nbstore.notebook.execute(nb)
+    nb.metadata.pop("language_info")
+    assert get_key(nb) == key
+
+
+def test_get_path(tmp_path: Path):
+    cache = Cache(tmp_path)
+    assert cache.get_path("abcdef") == tmp_path / "ab" / "abcdef.json"
+
+
+def test_load_missing(tmp_path: Path):
+    cache = Cache(tmp_path)
+    assert not cache.load("abc", new_notebook("a"))
+
+
+def test_load_invalid(tmp_path: Path):
+    cache = Cache(tmp_path)
+    path = cache.get_path("abc")
+    path.parent.mkdir()
+    path.write_text("{")
+    assert not cache.load("abc", new_notebook("a"))
+
+
+def test_save_load(tmp_path: Path):
+    cache = Cache(tmp_path)
+    nb = new_notebook("# #id\nprint(1+1)")
+    key = get_key(nb)
+    nbstore.notebook.execute(nb)
+    cache.save(key, nb)
+
+    other = new_notebook("# #id\nprint(1+1)")
+    assert cache.load(key, other)
+    assert nbstore.notebook.get_stream(other, "id") == "2\n"
+    assert other.cells[0].execution_count == 1
+    assert other.metadata["language_info"]["name"] == "python"
+
+
+def test_load_cell_count_mismatch(tmp_path: Path):
+    cache = Cache(tmp_path)
+    cache.save("abc", new_notebook("a"))
+    assert not cache.load("abc", new_notebook("a", "b"))
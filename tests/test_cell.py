@@ -1,4 +1,5 @@
 import textwrap
+from pathlib import Path
 
 import nbformat
 import nbstore.notebook
@@ -214,3 +215,47 @@ def test_image_markdwon_invalid_mime():
     image = Image("abc", "a", [], {}, "", "a.py")
     cell = Cell(image, "", "", "")
     assert get_image_markdown(cell) == ""
+
+
+def test_get_image_filename():
+    from nbsync.asset import get_image_filename
+
+    name = get_image_filename("image/png", b"abc")
+    assert name.endswith(".png")
+    assert len(name) == 36
+    assert get_image_filename("image/png", b"abc") == name
+    assert get_image_filename("image/png", b"abd") != name
+    svg = get_image_filename("image/svg+xml", "abc")
+    assert svg.endswith(".svg")
+    assert svg == get_image_filename("image/svg+xml", b"abc")
+    assert svg != get_image_filename("image/svg+xml", "abcd")
+
+
+def test_image_deterministic(convert):
+    x = convert("![a](a.ipynb){#fig}")
+    assert convert("![a](a.ipynb){#fig}") == x
+
+
+def test_image_markdown_asset_dir():
+    from nbsync.asset import get_image_filename
+    from nbsync.cell import get_image_markdown
+
+    image = Image("abc", "a", [], {}, "", "a.py")
+    cell = Cell(image, "", "image/png", b"abc")
+    name = get_image_filename("image/png", b"abc")
+    x = get_image_markdown(cell, "../assets/")
+    assert x == f"![](../assets/{name}){{#a}}"
+    assert image.url == f"../assets/{name}"
+
+
+def test_image_markdown_asset(tmp_path: Path):
+    from nbsync.asset import AssetStore, get_image_filename
+    from nbsync.cell import get_image_markdown
+
+    asset = AssetStore(tmp_path).put("image/png", b"abc")
+    image = Image("abc", "a", [], {}, "", "a.py")
+    cell = Cell(image, "", "image/png", asset)
+    name = get_image_filename("image/png", b"abc")
+    assert get_image_markdown(cell) == f"![]({name}){{#a}}"
+    assert cell.read_content() == b"abc"
+    assert Cell(image, "", "image/png", b"abc").read_content() == b"abc"
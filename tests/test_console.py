@@ -0,0 +1,86 @@
+import shlex
+import subprocess
+import sys
+from pathlib import Path
+
+import nbformat
+import pytest
+from nbformat import NotebookNode
+
+from nbsync.console import execute, get_command, get_metadata, is_console
+
+# pyright: reportUnknownMemberType=false
+
+
+def new_notebook(*commands: str | None) -> NotebookNode:
+    nb = nbformat.v4.new_notebook()
+    for command in commands:
+        cell = nbformat.v4.new_code_cell("")
+        if command is not None:
+            cell.metadata.update(get_metadata(command))
+        nb.cells.append(cell)
+    return nb
+
+
+def python(source: str) -> str:
+    return f"{shlex.quote(sys.executable)} -c {shlex.quote(source)}"
+
+
+def test_get_command():
+    cell = nbformat.v4.new_code_cell("")
+    assert get_command(cell) is None
+    cell.metadata.update(get_metadata("$ ls -la", "docs"))
+    assert get_command(cell) == (["ls", "-la"], "docs")
+
+
+def test_is_console():
+    assert is_console(new_notebook("ls", "pwd"))
+    assert not is_console(new_notebook("ls", None))
+    assert not is_console(new_notebook())
+
+
+def test_execute():
+    echo = python("import sys; print(*sys.argv[1:])")
+    nb = new_notebook(python("print(1)"), "", f"$ {echo} a  b")
+    execute(nb)
+    assert nb.cells[0].outputs[0].text == "1\n"
+    assert nb.cells[1].outputs == []
+    assert nb.cells[2].outputs[0] == {
+        "output_type": "stream",
+        "name": "stdout",
+        "text": "a b\n",
+    }
+
+
+def test_execute_workdir(tmp_path: Path):
+    tmp_path.joinpath("a.txt").touch()
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell(""))
+    command = python("import os; print(*os.listdir())")
+    nb.cells[0].metadata.update(get_metadata(command, str(tmp_path)))
+    execute(nb)
+    assert nb.cells[0].outputs[0].text == "a.txt\n"
+
+
+def test_execute_error():
+    nb = new_notebook(python("import sys; sys.exit(1)"))
+    with pytest.raises(subprocess.CalledProcessError):
+        execute(nb)
+
+
+def test_execute_timeout():
+    from nbsync.limits import Limits
+
+    nb = new_notebook(python("import time; time.sleep(10)"))
+    with pytest.raises(TimeoutError, match="Timed out after 0.5 seconds"):
+        execute(nb, Limits(timeout=0.5))
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no resource limits")
+def test_execute_limits():
+    from nbsync.limits import Limits
+
+    source = "import resource; print(resource.getrlimit(resource.RLIMIT_AS)[0])"
+    nb = new_notebook(python(source))
+    execute(nb, Limits(memory=2**34))
+    assert nb.cells[0].outputs[0].text == f"{2**34}\n"
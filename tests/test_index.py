@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from nbstore import Store
+
+from nbsync.index import Index, iter_paths
+
+
+def test_update():
+    index = Index()
+    index.update("a.md", ["a.ipynb", "b.ipynb"])
+    index.update("b.md", ["b.ipynb"])
+    assert index.get_notebooks("a.md") == {"a.ipynb", "b.ipynb"}
+    assert index.get_pages(["b.ipynb"]) == {"a.md", "b.md"}
+    assert index.get_pages(["a.ipynb", "c.ipynb"]) == {"a.md"}
+
+
+def test_update_replace():
+    index = Index()
+    index.update("a.md", ["a.ipynb"])
+    index.update("a.md", ["b.ipynb"])
+    assert index.notebooks == {"b.ipynb": {"a.md"}}
+
+
+def test_remove():
+    index = Index()
+    index.update("a.md", ["a.ipynb"])
+    index.update("b.md", ["a.ipynb"])
+    index.remove("a.md")
+    index.remove("c.md")
+    assert index.pages == {"b.md": {"a.ipynb"}}
+    assert index.notebooks == {"a.ipynb": {"b.md"}}
+
+
+def test_get_notebooks_unknown():
+    assert Index().get_notebooks("a.md") == set()
+
+
+def test_find_urls(tmp_path: Path):
+    store = Store([tmp_path / "x", tmp_path / "y"])
+    index = Index()
+    index.update("a.md", ["a.ipynb", "sub/b.ipynb"])
+    paths = [tmp_path / "y" / "sub" / "b.ipynb", tmp_path / "c.ipynb"]
+    assert index.find_urls(store, paths) == {"sub/b.ipynb"}
+    assert index.find_urls(store, [str(tmp_path / "x/a.ipynb")]) == {"a.ipynb"}
+
+
+def test_iter_paths_absolute(tmp_path: Path):
+    path = tmp_path / "a.ipynb"
+    assert list(iter_paths(Store(tmp_path), str(path))) == [path]
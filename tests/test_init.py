@@ -0,0 +1,41 @@
+import subprocess
+import sys
+
+import pytest
+
+import nbsync
+
+
+def get_modules(code: str) -> set[str]:
+    code = f"import sys\n{code}\nprint(' '.join(sys.modules))"
+    stdout = subprocess.check_output([sys.executable, "-c", code], text=True)
+    return set(stdout.split())
+
+
+def test_import():
+    modules = get_modules("import nbsync")
+    assert "nbsync" in modules
+    assert "nbsync.sync" not in modules
+    assert "nbformat" not in modules
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["asyncio", "jupyter_client", "nbclient", "nbconvert", "zmq"],
+)
+def test_import_sync(module: str):
+    modules = get_modules("import nbsync.sync")
+    assert "nbsync.sync" in modules
+    assert module not in modules
+
+
+def test_getattr():
+    from nbsync.cell import Cell
+    from nbsync.sync import Synchronizer
+
+    assert nbsync.Cell is Cell
+    assert nbsync.Synchronizer is Synchronizer
+    assert nbsync.Store.__module__.startswith("nbstore")
+
+    with pytest.raises(AttributeError, match="has no attribute 'x'"):
+        _ = nbsync.x
@@ -0,0 +1,182 @@
+import nbformat
+import nbstore.notebook
+import pytest
+from nbformat import NotebookNode
+
+from nbsync.kernel import Kernel, KernelPool, get_first_changed_index, is_appended
+
+# pyright: reportUnknownMemberType=false
+
+
+def new_notebook(*sources: str) -> NotebookNode:
+    nb = nbformat.v4.new_notebook()
+    for source in sources:
+        nb.cells.append(nbformat.v4.new_code_cell(source))
+    return nb
+
+
+@pytest.mark.parametrize(
+    ("sources", "other", "expected"),
+    [
+        ([], ["a"], 0),
+        (["a"], [], 0),
+        (["a", "b"], ["a", "b"], 2),
+        (["a", "b"], ["a", "c"], 1),
+        (["a", "b"], ["a", "b", "c"], 2),
+        (["a", "b", "c"], ["a", "b"], 2),
+        (["a", "b"], ["c", "b"], 0),
+    ],
+)
+def test_get_first_changed_index(sources: list[str], other: list[str], expected: int):
+    cells = new_notebook(*sources).cells
+    other_cells = new_notebook(*other).cells
+    assert get_first_changed_index(cells, other_cells) == expected
+
+
+@pytest.mark.parametrize(
+    ("sources", "other", "expected"),
+    [
+        ([], [], True),
+        ([], ["a"], True),
+        (["a"], ["a", "b"], True),
+        (["a"], ["a"], False),
+        (["a", "b"], ["a"], False),
+        (["a", "b"], ["a", "c", "d"], False),
+    ],
+)
+def test_is_appended(sources: list[str], other: list[str], expected: bool):
+    cells = new_notebook(*sources).cells
+    other_cells = new_notebook(*other).cells
+    assert is_appended(cells, other_cells) is expected
+
+
+@pytest.fixture
+def kernel():
+    kernel = Kernel()
+    yield kernel
+    kernel.shutdown()
+
+
+def test_execute(kernel: Kernel):
+    nb = new_notebook("# #a\nx = [1]", "# #b\nx.append(2)\nprint(x)")
+    assert kernel.execute(nb) == 2
+    assert nbstore.notebook.get_stream(nb, "b") == "[1, 2]\n"
+    assert nb.metadata["language_info"]["name"] == "python"
+
+    nb = new_notebook("# #a\nx = [1]", "# #b\nx.append(3)\nprint(x)")
+    assert kernel.execute(nb) == 2
+    assert nb.cells[0].execution_count == 1
+    assert nbstore.notebook.get_stream(nb, "b") == "[1, 3]\n"
+    assert nb.metadata["language_info"]["name"] == "python"
+
+
+def test_execute_same(kernel: Kernel):
+    nb = new_notebook("x = [1]", "# #a\nx.append(2)\nprint(x)")
+    kernel.execute(nb)
+    nb = new_notebook("x = [1]", "# #a\nx.append(2)\nprint(x)")
+    assert kernel.execute(nb) == 2
+    assert nbstore.notebook.get_stream(nb, "a") == "[1, 2]\n"
+
+
+def test_execute_append(kernel: Kernel):
+    nb = new_notebook("# #a\nx = 1")
+    assert kernel.execute(nb) == 1
+    nb = new_notebook("# #a\nx = 1", "# #b\nprint(x + 1)")
+    assert kernel.execute(nb) == 1
+    assert nb.cells[0].execution_count == 1
+    assert nbstore.notebook.get_stream(nb, "b") == "2\n"
+
+
+def test_execute_restart(kernel: Kernel):
+    nb = new_notebook("x = 1")
+    kernel.execute(nb)
+    nb = new_notebook("# #a\nprint('x' in globals())")
+    assert kernel.execute(nb) == 1
+    assert nbstore.notebook.get_stream(nb, "a") == "False\n"
+
+
+def test_execute_error_restart(kernel: Kernel):
+    nb = new_notebook("x = 1", "1/0")
+    with pytest.raises(Exception, match="ZeroDivisionError"):
+        kernel.execute(nb)
+    assert kernel.cells == []
+
+    nb = new_notebook("x = 1", "# #a\nprint(x)")
+    assert kernel.execute(nb) == 2
+    assert nbstore.notebook.get_stream(nb, "a") == "1\n"
+
+
+def test_shutdown(kernel: Kernel):
+    kernel.execute(new_notebook("x = 1"))
+    assert kernel.client is not None
+    kernel.shutdown()
+    assert kernel.client is None
+    assert kernel.cells == []
+
+
+def test_execute_preamble():
+    kernel = Kernel("y = 10")
+    nb = new_notebook("# #a\nprint(y)")
+    kernel.execute(nb)
+    assert nbstore.notebook.get_stream(nb, "a") == "10\n"
+    kernel.shutdown()
+
+
+def test_reset(kernel: Kernel):
+    kernel.preamble = "y = 10"
+    kernel.execute(new_notebook("x = 1"))
+    kernel.reset()
+    assert kernel.cells == []
+    nb = new_notebook("# #a\nprint('x' in globals(), y)")
+    assert kernel.execute(nb) == 1
+    assert nbstore.notebook.get_stream(nb, "a") == "False 10\n"
+
+
+def test_reset_not_started(kernel: Kernel):
+    kernel.reset()
+    assert kernel.client is None
+
+
+@pytest.fixture
+def pool():
+    pool = KernelPool(2, "import json")
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_warm(pool: KernelPool):
+    pool.warm()
+    assert len(pool.kernels) == 2
+    assert all(kernel.client for kernel in pool.kernels)
+    pool.warm()
+    assert len(pool.kernels) == 2
+
+
+def test_pool_acquire_release(pool: KernelPool):
+    kernel = pool.acquire()
+    nb = new_notebook("# #a\nx = json.dumps(1)\nprint(x)")
+    kernel.execute(nb)
+    assert nbstore.notebook.get_stream(nb, "a") == "1\n"
+    pool.release(kernel)
+    assert pool.kernels == [kernel]
+
+    assert pool.acquire() is kernel
+    nb = new_notebook("# #a\nprint('x' in globals())")
+    kernel.execute(nb)
+    assert nbstore.notebook.get_stream(nb, "a") == "False\n"
+    pool.release(kernel)
+
+
+def test_pool_release_full(pool: KernelPool):
+    kernels = [pool.acquire() for _ in range(3)]
+    for kernel in kernels:
+        pool.release(kernel)
+    assert len(pool.kernels) == 2
+    assert kernels[2].client is None
+
+
+def test_pool_release_dead(pool: KernelPool):
+    kernel = pool.acquire()
+    kernel.shutdown()
+    pool.release(kernel)
+    assert pool.kernels == []
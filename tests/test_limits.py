@@ -0,0 +1,144 @@
+import os
+import subprocess
+import sys
+import time
+
+import nbformat
+import pytest
+from nbformat import NotebookNode
+
+from nbsync.limits import Limits, Monitor, get_cpu_time, get_timeout, has_prlimit
+
+# pyright: reportUnknownMemberType=false
+
+
+def new_notebook(*sources: str) -> NotebookNode:
+    nb = nbformat.v4.new_notebook()
+    for source in sources:
+        nb.cells.append(nbformat.v4.new_code_cell(source))
+    return nb
+
+
+def test_get_timeout():
+    cell = nbformat.v4.new_code_cell("")
+    assert get_timeout(cell) is None
+    cell.metadata["nbsync"] = {"timeout": 3}
+    assert get_timeout(cell) == 3
+
+
+def test_monitor():
+    nb = new_notebook("# #a\nx", "y")
+    nb.cells[0].metadata["nbsync"] = {"timeout": 3}
+    monitor = Monitor(nb, Limits(timeout=10))
+    assert monitor.get_cell_name() == "unknown cell"
+    assert monitor(nb.cells[0]) == 3
+    assert monitor.get_cell_name() == "cell 'a'"
+    assert monitor(nb.cells[1]) == 10
+    assert monitor.get_cell_name() == "cell [1]"
+    assert str(monitor.timeout_error()) == "Timed out after 10 seconds in cell [1]"
+    assert str(monitor.dead_kernel_error()) == "Kernel died in cell [1]"
+
+
+def test_monitor_disabled():
+    nb = new_notebook("x")
+    assert Monitor(nb, Limits(timeout=None))(nb.cells[0]) is None
+    nb.cells[0].metadata["nbsync"] = {"timeout": 0}
+    assert Monitor(nb, Limits())(nb.cells[0]) is None
+
+
+def test_monitor_notebook_timeout():
+    nb = new_notebook("x")
+    monitor = Monitor(nb, Limits(timeout=None, notebook_timeout=0.1))
+    timeout = monitor(nb.cells[0])
+    assert timeout is not None
+    assert 0 < timeout <= 0.1
+    assert Monitor(nb, Limits(timeout=0.01, notebook_timeout=1))(nb.cells[0]) == 0.01
+    time.sleep(0.1)
+    assert monitor(nb.cells[0]) == 1e-3
+    assert str(monitor.timeout_error()).startswith("Notebook timed out after 0.1")
+
+
+def test_get_process_kwargs():
+    assert Limits().get_process_kwargs() == {}
+    kwargs = Limits(memory=2**30).get_process_kwargs()
+    assert ("preexec_fn" in kwargs) is not has_prlimit()
+
+
+def test_get_process_kwargs_windows(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+):
+    import nbsync.limits
+
+    monkeypatch.setattr(nbsync.limits, "has_prlimit", lambda: False)
+    monkeypatch.setattr(sys, "platform", "win32")
+    nbsync.limits.warn_unsupported.cache_clear()
+    assert Limits(memory=2**30).get_process_kwargs() == {}
+    assert Limits(cpu=10).get_process_kwargs() == {}
+    assert caplog.text.count("not supported on Windows") == 1
+
+
+def test_get_cpu_time():
+    assert get_cpu_time(os.getpid()) >= 0
+    assert get_cpu_time(-1) == 0
+
+
+@pytest.mark.skipif(not has_prlimit(), reason="prlimit is not available")
+def test_apply():
+    import resource
+
+    source = "import time\ntime.sleep(10)"
+    with subprocess.Popen([sys.executable, "-c", source]) as process:
+        try:
+            Limits(memory=2**34, cpu=1000).apply(process.pid)
+            memory = resource.prlimit(process.pid, resource.RLIMIT_AS)
+            cpu = resource.prlimit(process.pid, resource.RLIMIT_CPU)
+        finally:
+            process.kill()
+
+    assert memory[0] == 2**34
+    assert 1000 <= cpu[0] <= 1002
+
+
+def test_execute_timeout():
+    from nbsync.kernel import execute
+
+    nb = new_notebook("print(1)", "# #slow\nimport time\ntime.sleep(10)")
+    nb.cells[1].metadata["nbsync"] = {"timeout": 1}
+    with pytest.raises(TimeoutError, match="Timed out after 1 seconds in cell 'slow'"):
+        execute(nb)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="resource is not available")
+def test_execute_rlimits():
+    from nbsync.kernel import execute
+
+    source = "import resource\nprint(resource.getrlimit(resource.RLIMIT_CPU)[0])"
+    nb = new_notebook(source)
+    execute(nb, Limits(cpu=1000))
+    assert 1000 <= int(nb.cells[0].outputs[0].text) <= 1010
+
+
+def test_kernel_timeout():
+    from nbsync.kernel import Kernel
+
+    kernel = Kernel(limits=Limits(timeout=1))
+    nb = new_notebook("import time\ntime.sleep(10)")
+    with pytest.raises(TimeoutError, match="in cell \\[0\\]"):
+        kernel.execute(nb)
+    assert kernel.client is None
+
+
+@pytest.mark.skipif(not has_prlimit(), reason="prlimit is not available")
+def test_kernel_rlimits():
+    from nbsync.kernel import Kernel
+
+    kernel = Kernel(limits=Limits(cpu=1000))
+    source = "import resource\nprint(resource.getrlimit(resource.RLIMIT_CPU)[0])"
+    nb = new_notebook("sum(range(10**7))")
+    kernel.execute(nb)
+    nb = new_notebook("sum(range(10**7))", source)
+    kernel.execute(nb)
+    limit = int(nb.cells[1].outputs[0].text)
+    kernel.shutdown()
+    assert 1000 < limit <= 1010
@@ -166,6 +166,32 @@ def test_create_code_block():
         "print(subprocess.check_output(['ls', '-la'], text=True).rstrip())",
     ]
     assert code_block.source == "\n".join(lines)
+    assert code_block.classes == ["console"]
+    assert code_block.attributes == {"command": "$ ls -la"}
+
+
+def test_create_code_block_workdir():
+    image = Image("", "", ["console"], {"workdir": "docs"}, "ls")
+    code_block = create_code_block(image)
+    assert code_block.attributes == {"command": "ls", "workdir": "docs"}
+    assert not image.attributes
+
+
+def test_create_code_block_timeout():
+    image = Image("", "", [], {"timeout": "30", "title": "a"}, "x")
+    code_block = create_code_block(image)
+    assert code_block.attributes == {"timeout": "30"}
+    assert image.attributes == {"title": "a"}
+
+
+@pytest.mark.parametrize(
+    ("source", "expected"),
+    [("ls -la", ["ls", "-la"]), ("$ ls 'a b'", ["ls", "a b"]), ("$", []), ("", [])],
+)
+def test_split_command(source: str, expected: list[str]):
+    from nbsync.markdown import split_command
+
+    assert split_command(source) == expected
 
 
 def test_create_code_block_empty():
@@ -313,3 +339,28 @@ def test_is_truelike(value: str, *, expected: bool):
 
     assert is_truelike(value) == expected
     assert is_truelike(value.upper()) == expected
+
+
+@pytest.mark.parametrize(
+    ("line", "expected"),
+    [
+        ('```python a.md#id source="on"', "```python  "),
+        ("```python a.md#idx source=1", "```python a.md#idx "),
+        ('```{.python a#id title="a #b" source="x y"}', '```{.python  title="a #b" }'),
+        ("```a.md#id", "```"),
+        ("~~~ .python a.md#id", "~~~ .python "),
+        ("```python a.md#i.d", "```python "),
+    ],
+)
+def test_strip_attributes(line: str, expected: str):
+    from nbsync.markdown import SOURCE, strip_attributes
+
+    assert strip_attributes(line, SOURCE, "i.d" if "i.d" in line else "id") == expected
+
+
+def test_strip_attributes_keys():
+    from nbsync.markdown import strip_attributes
+
+    line = '```python a.md#id exec="1" source=on'
+    assert strip_attributes(line) == line
+    assert strip_attributes(line, ["exec"]) == "```python a.md#id  source=on"
@@ -1,7 +1,10 @@
+from pathlib import Path
+from typing import Any
+
 import nbformat
 import nbstore.notebook
 
-from nbsync.notebook import Notebook
+from nbsync.notebook import Notebook, Notebooks, get_output_bytes
 
 # pyright: reportUnknownMemberType=false
 
@@ -50,3 +53,262 @@ def test_execute():
     assert x > 0
     assert nbstore.notebook.get_stream(notebook.nb, "id") == "2\n"
     assert notebook.execution_needed is False
+
+
+def test_aexecute():
+    import asyncio
+
+    notebook = Notebook(nbformat.v4.new_notebook())
+    notebook.add_cell("id", "print(1+1)")
+    x = asyncio.run(notebook.aexecute())
+    assert x > 0
+    assert nbstore.notebook.get_stream(notebook.nb, "id") == "2\n"
+    assert notebook.execution_needed is False
+    assert "language_info" in notebook.nb.metadata
+
+
+def test_execute_cache(tmp_path: Path):
+    from nbsync.cache import Cache
+
+    cache = Cache(tmp_path)
+    notebook = Notebook(nbformat.v4.new_notebook())
+    notebook.add_cell("id", "print(1+1)")
+    assert not notebook.restore(cache)
+    notebook.execute(cache)
+
+    notebook = Notebook(nbformat.v4.new_notebook())
+    notebook.add_cell("id", "print(1+1)")
+    assert notebook.restore(cache)
+    assert notebook.execution_needed is False
+    assert nbstore.notebook.get_stream(notebook.nb, "id") == "2\n"
+
+
+def test_fingerprint():
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell("a"))
+    notebook = Notebook(nb)
+    fingerprint = notebook.fingerprint
+    assert notebook.fingerprint == fingerprint
+    notebook.add_cell("id", "b")
+    assert notebook.fingerprint != fingerprint
+
+
+def test_fingerprint_incremental():
+    notebook1 = Notebook(nbformat.v4.new_notebook())
+    assert notebook1.fingerprint
+    notebook1.add_cell("id", "a")
+    notebook1.add_cell("id2", "b")
+
+    notebook2 = Notebook(nbformat.v4.new_notebook())
+    notebook2.add_cell("id", "a")
+    notebook2.add_cell("id2", "b")
+    assert notebook1.fingerprint == notebook2.fingerprint
+
+
+def test_fingerprint_boundary():
+    nb1 = nbformat.v4.new_notebook()
+    nb1.cells.extend([nbformat.v4.new_code_cell("ab"), nbformat.v4.new_code_cell("")])
+    nb2 = nbformat.v4.new_notebook()
+    nb2.cells.extend([nbformat.v4.new_code_cell("a"), nbformat.v4.new_code_cell("b")])
+    assert not Notebook(nb1).equals(Notebook(nb2))
+
+
+def test_fingerprint_metadata():
+    notebook1 = Notebook(nbformat.v4.new_notebook())
+    notebook1.add_cell("id", "a", {"nbsync": {"timeout": 1.0}})
+    notebook2 = Notebook(nbformat.v4.new_notebook())
+    notebook2.add_cell("id", "a", {"nbsync": {"timeout": 30.0}})
+    assert not notebook1.equals(notebook2)
+    notebook3 = Notebook(nbformat.v4.new_notebook())
+    notebook3.add_cell("id", "a")
+    assert not notebook1.equals(notebook3)
+
+
+def test_fingerprint_ignores_outputs():
+    nb = nbformat.v4.new_notebook()
+    notebook = Notebook(nb)
+    notebook.add_cell("id", "print(1)")
+    fingerprint = notebook.fingerprint
+    notebook.execute()
+    assert notebook.fingerprint == fingerprint
+
+
+def test_add_cell_overlay():
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_markdown_cell("# Title"))
+    nb.cells.append(nbformat.v4.new_code_cell("# #a\nprint(1)"))
+    nb.cells[1].outputs.append(nbformat.v4.new_output("stream", text="old\n"))
+    notebook = Notebook(nb)
+    notebook.add_cell("b", "print(2)")
+    assert notebook.nb.cells[0] is nb.cells[0]
+    assert notebook.nb.cells[1] is nb.cells[1]
+    assert notebook.nb.metadata is not nb.metadata
+
+    notebook.execute()
+    assert notebook.nb.cells[0] is nb.cells[0]
+    assert notebook.nb.cells[1] is not nb.cells[1]
+    assert nbstore.notebook.get_stream(notebook.nb, "a") == "1\n"
+    assert nbstore.notebook.get_stream(notebook.nb, "b") == "2\n"
+    assert nbstore.notebook.get_stream(nb, "a") == "old\n"
+    assert "language_info" not in nb.metadata
+    assert "execution" not in nb.cells[1].metadata
+
+
+def test_materialize():
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell("a"))
+    notebook = Notebook(nb)
+    notebook.materialize()
+    assert notebook.nb is not nb
+    cell = notebook.nb.cells[0]
+    assert cell is not nb.cells[0]
+    assert cell.source == "a"
+    notebook.add_cell("b", "b")
+    notebook.materialize()
+    assert notebook.nb.cells[0] is cell
+    assert len(nb.cells) == 1
+
+
+def test_execute_unmodified():
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell("# #a\nprint(1)"))
+    notebook = Notebook(nb)
+    notebook.set_execution_needed()
+    notebook.execute()
+    assert nbstore.notebook.get_stream(notebook.nb, "a") == "1\n"
+    assert not nb.cells[0].outputs
+    assert "language_info" not in nb.metadata
+
+
+def test_index():
+    nb = nbformat.v4.new_notebook()
+    sources = ["# #a\n1", "# %% #b\n2", "#| label: c\n3", "# | label: d\n4"]
+    sources.extend(["# #a\n5", "# #e", "x\ny"])
+    for source in sources:
+        nb.cells.append(nbformat.v4.new_code_cell(source))
+    notebook = Notebook(nb)
+    assert list(notebook.index) == ["a", "b", "c", "d"]
+    assert notebook.index["a"] is nb.cells[0]
+    notebook.add_cell("f", "6")
+    assert notebook.index["f"] is notebook.nb.cells[-1]
+
+
+def test_select():
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["language_info"] = {"name": "julia"}
+    nb.cells.append(nbformat.v4.new_code_cell("# #a\nprint(1)"))
+    nb.cells.append(nbformat.v4.new_code_cell("# #b\nprint(2)"))
+    notebook = Notebook(nb)
+    x = notebook.select("b")
+    assert x.cells == [nb.cells[1]]
+    assert nbstore.notebook.get_source(x, "b") == "print(2)"
+    assert nbstore.notebook.get_language(x) == "julia"
+    assert notebook.select("c").cells == []
+
+
+def test_index_execute():
+    notebook = Notebook(nbformat.v4.new_notebook())
+    notebook.add_cell("a", "print(1)")
+    assert "a" in notebook.index
+    notebook.execute()
+    x = notebook.select("a")
+    assert nbstore.notebook.get_stream(x, "a") == "1\n"
+
+
+def new_executed(source: str, text: str = "") -> Notebook:
+    nb = nbformat.v4.new_notebook()
+    cell = nbformat.v4.new_code_cell(source)
+    cell.outputs.append(nbformat.v4.new_output("stream", name="stdout", text=text))
+    nb.cells.append(cell)
+    notebook = Notebook(nb)
+    notebook.finish(None, "")
+    return notebook
+
+
+def test_output_bytes():
+    notebook = Notebook(nbformat.v4.new_notebook())
+    assert notebook.output_bytes == 0
+    notebook = new_executed("a", "x" * 100)
+    assert notebook.executed
+    assert notebook.output_bytes == 100
+    notebook.nb.cells[0].outputs.clear()
+    assert notebook.output_bytes == 100
+    notebook.finish(None, "")
+    assert notebook.output_bytes == 0
+
+
+def test_get_output_bytes():
+    cell = nbformat.v4.new_code_cell("")
+    assert get_output_bytes(cell) == 0
+    data: dict[str, Any] = {
+        "image/png": "x" * 10,
+        "text/plain": ["a", "bc"],
+        "application/json": {},
+    }
+    cell.outputs.append(nbformat.v4.new_output("display_data", data=data))
+    cell.outputs.append(nbformat.v4.new_output("stream", name="stdout", text="abc"))
+    traceback = ["T", "E"]
+    cell.outputs.append(nbformat.v4.new_output("error", traceback=traceback))
+    assert get_output_bytes(cell) == 10 + 3 + 2 + 3 + 2
+
+
+def test_notebooks():
+    notebooks = Notebooks()
+    notebook = Notebook(nbformat.v4.new_notebook())
+    notebooks["a"] = notebook
+    assert notebooks["a"] is notebook
+    assert notebooks.get("b") is None
+    assert list(notebooks) == ["a"]
+    assert len(notebooks) == 1
+    del notebooks["a"]
+    assert not notebooks
+
+
+def test_notebooks_evict_count():
+    notebooks = Notebooks(max_count=2)
+    for url in "abc":
+        notebooks[url] = new_executed(url)
+    notebooks.touch("a")
+    notebooks.touch("x")
+    assert notebooks.evict() == ["b"]
+    assert list(notebooks) == ["c", "a"]
+    assert notebooks.evicted == {"b": (new_executed("b").fingerprint, True)}
+    assert notebooks.evict() == []
+
+
+def test_notebooks_evict_bytes():
+    notebooks = Notebooks(max_bytes=250)
+    for url in "abc":
+        notebooks[url] = new_executed(url, "x" * 100)
+    assert notebooks.nbytes == 300
+    assert notebooks.evict() == ["a"]
+    assert notebooks.nbytes == 200
+
+
+def test_notebooks_evict_unlimited():
+    notebooks = Notebooks()
+    notebooks["a"] = new_executed("a", "x" * 100)
+    assert notebooks.evict() == []
+
+
+def test_notebooks_was_executed():
+    notebooks = Notebooks(max_count=0)
+    notebooks["a"] = new_executed("a")
+    notebooks["b"] = Notebook(nbformat.v4.new_notebook())
+    notebooks.evict()
+    assert notebooks.was_executed("a", new_executed("a"))
+    assert not notebooks.was_executed("a", new_executed("b"))
+    assert not notebooks.was_executed("b", Notebook(nbformat.v4.new_notebook()))
+    notebooks["a"] = new_executed("a")
+    assert "a" not in notebooks.evicted
+
+
+def test_notebooks_max_evicted():
+    notebooks = Notebooks(max_count=0, max_evicted=2)
+    for url in "abc":
+        notebooks[url] = new_executed(url)
+        notebooks.evict()
+    assert list(notebooks.evicted) == ["b", "c"]
+    notebooks["a"] = new_executed("a")
+    notebooks.evict()
+    assert list(notebooks.evicted) == ["c", "a"]
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING
+
+import pytest
+from nbstore.markdown import CodeBlock, Image
+
+import nbsync.markdown
+from nbsync.parser import (
+    Page,
+    Parser,
+    copy_element,
+    get_code_reach,
+    get_common_prefix,
+    get_image_reach,
+    get_key,
+    get_text_reach,
+    is_comment,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from nbsync.markdown import Element
+from nbsync.trace import Recorder
+
+TEXT = """\
+# Title
+
+![a](a.ipynb){#a width=100}
+
+```python exec="1"
+print(1)
+```
+"""
+
+
+def test_parse():
+    parser = Parser()
+    elems = parser.parse(TEXT)
+    assert any(isinstance(elem, Image) for elem in elems)
+    assert len(parser.entries) == 1
+    assert parser.nbytes == len(TEXT)
+
+
+def test_parse_hit():
+    recorder = Recorder()
+    parser = Parser(tracer=recorder)
+    x = parser.parse(TEXT)
+    y = parser.parse(TEXT)
+    assert x == y
+    assert recorder.counters["parse.hit"] == 1
+
+
+def test_parse_copy():
+    parser = Parser()
+    x = parser.parse(TEXT)
+    for elem in x:
+        if isinstance(elem, Image | CodeBlock):
+            elem.attributes.clear()
+            elem.classes.append("x")
+            elem.identifier = "x"
+    y = parser.parse(TEXT)
+    assert x != y
+    image = next(elem for elem in y if isinstance(elem, Image))
+    assert image.identifier == "a"
+    assert image.attributes == {"width": "100"}
+
+
+def test_parse_evict():
+    parser = Parser(max_bytes=len(TEXT) + 1)
+    parser.parse(TEXT)
+    parser.parse(TEXT + "a")
+    assert len(parser.entries) == 1
+    assert parser.nbytes == len(TEXT) + 1
+
+
+def test_parse_keep_last():
+    parser = Parser(max_bytes=1)
+    parser.parse(TEXT)
+    assert len(parser.entries) == 1
+
+
+def test_clear():
+    parser = Parser()
+    parser.parse(TEXT)
+    parser.clear()
+    assert not parser.entries
+    assert parser.nbytes == 0
+
+
+def test_copy_element_str():
+    assert copy_element("abc") == "abc"
+
+
+def test_copy_element():
+    image = Image("text", "id", ["a"], {"b": "c"}, url="a.ipynb")
+    x = copy_element(image)
+    assert isinstance(x, Image)
+    assert x == image
+    assert x is not image
+    assert x.classes is not image.classes
+    assert x.attributes is not image.attributes
+
+
+def test_parse_src_uri():
+    parser = Parser()
+    parser.parse(TEXT, "a.md")
+    assert parser.pages == {"a.md": get_key(TEXT)}
+
+
+PAGE = "".join(
+    f'## {k}\n\n![{k}](a.ipynb){{#c{k}}}\n\n```python exec="1"\nprint({k})\n```\n\n'
+    for k in range(20)
+)
+
+
+def parse_items(text: str) -> Page:
+    parser = Parser(incremental=True)
+    parser.parse(text, "a.md")
+    return parser.entries[get_key(text)]
+
+
+def test_parse_incremental():
+    parser = Parser(incremental=True)
+    parser.parse(PAGE, "a.md")
+    base = parser.entries[get_key(PAGE)]
+    text = PAGE.replace("print(10)", "print(100)")
+    elems = parser.parse(text, "a.md")
+    assert elems == list(nbsync.markdown.parse(text))
+    page = parser.entries[get_key(text)]
+    assert page.items[0] is base.items[0]
+    assert page.items[-1] is base.items[-1]
+    assert page.starts[-1] == len(text)
+
+
+@pytest.mark.parametrize(
+    ("old", "new"),
+    [
+        ("a\n```\nb\n\nc\n", "a\n```\nb\n\nc\n```\n"),
+        ("a\n````\nb\n```\n\nc\n", "a\n````\nb\n```\n\nc\n````\n"),
+        ("a\n<!--\nb\n\nc\n", "a\n<!--\nb\n\nc\n-->\n"),
+        ("![x](a.png)\nb\n\nc\n", "![x](a.png)\nb\n\nc{#d}\n"),
+        ("![a](b](c.ipynb){#d}\n\ne\n", "![a](b](c.ipynb){#d}\n\ne](f.ipynb){#g}\n"),
+        ("a\n\n![b](c.ipynb){#d}\n", "a\n\n  ![b](c.ipynb){#d}\n"),
+        ("a\n\nb\n", 'a\n\n```python exec="1"\nb\n```\n'),
+    ],
+)
+def test_parse_incremental_pattern(old: str, new: str):
+    parser = Parser(incremental=True)
+    parser.parse(old, "a.md")
+    assert parser.parse(new, "a.md") == list(nbsync.markdown.parse(new))
+
+
+PIECES = [
+    "# Title\n\n",
+    "Some text.\n",
+    "\n",
+    "![a](a.ipynb){#a}\n",
+    "  ![b](b.ipynb){#b width=1}\n",
+    "![x](fig.png)\n",
+    '```python exec="1"\nprint(2)\n```\n',
+    "```python a.ipynb#c\nx\n```\n",
+    '```python source="tabbed-nbsync"\n![a](a.ipynb){#a}\n```\n',
+    "<!-- comment -->\n",
+    "<!--",
+    "-->",
+    "```",
+    "~~~~\n",
+    "![",
+    "](b.ipynb){#z}",
+    "`",
+    "}",
+]
+
+
+def parse_or_error(
+    func: Callable[..., Iterable[Element]],
+    *args: str,
+) -> list[Element] | str:
+    try:
+        return list(func(*args))
+    except (NotImplementedError, ValueError) as e:
+        return repr(e)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_parse_incremental_random(seed: int):
+    rng = random.Random(seed)  # noqa: S311
+    parser = Parser(incremental=True)
+    text = "".join(rng.choices(PIECES, k=30))
+
+    for _ in range(10):
+        x = parse_or_error(parser.parse, text, "a.md")
+        y = parse_or_error(nbsync.markdown.parse, text)
+        assert x == y
+        i = rng.randint(0, len(text))
+        j = min(len(text), i + rng.choice([0, 1, 10]))
+        text = text[:i] + "".join(rng.choices(PIECES, k=rng.randint(0, 2))) + text[j:]
+
+
+def test_parse_incremental_without_src_uri():
+    parser = Parser(incremental=True)
+    parser.parse(PAGE)
+    assert not parser.pages
+
+
+def test_restarts():
+    page = parse_items("a\n\n![b](c.ipynb){#d}\n\n```python\ne\n```\n\nf\n")
+    assert [page.items[k].text for k in page.restarts] == ["a\n\n", "\n\n", "\n\nf\n"]
+
+
+@pytest.mark.parametrize(
+    ("text", "n"),
+    [
+        ("a\n```\nb\n", 1),
+        ("a\n<!--\nb\n\n![c](d.ipynb){#e}\n", 1),
+        ("![a](b.png)\n```python\nc\n```\nd\n", 2),
+        ("![a](b.png)\n<!-- c -->\nd\n", 2),
+        ("a\n```\nb\n<!-- c -->\nd\n", 2),
+    ],
+)
+def test_restarts_blocked(text: str, n: int):
+    page = parse_items(text)
+    assert len(page.restarts) == n
+
+
+@pytest.mark.parametrize(
+    ("text", "reach"),
+    [
+        ("```python\na\n```", ""),
+        ("````python\na\n```", "comment"),
+        ("```python\n<!--\n```", "end"),
+    ],
+)
+def test_get_code_reach(text: str, reach: str):
+    assert get_code_reach(text) == reach
+
+
+@pytest.mark.parametrize(
+    ("text", "reach"),
+    [
+        ("![a](b.ipynb){#c}", ""),
+        ("![a](b](c.ipynb){#d}", "block"),
+        ("![a](b){c){#d}", "block"),
+        ("![a\n```\n](b.ipynb){#c}", "comment"),
+    ],
+)
+def test_get_image_reach(text: str, reach: str):
+    assert get_image_reach(text) == reach
+
+
+@pytest.mark.parametrize(
+    ("text", "reach"),
+    [("a\n", ""), ("a ![b\n", "block"), ("a\n~~~\n", "comment"), ("<!-- a", "end")],
+)
+def test_get_text_reach(text: str, reach: str):
+    assert get_text_reach(text) == reach
+
+
+@pytest.mark.parametrize(
+    ("a", "b", "expected"),
+    [("", "", 0), ("abc", "abd", 2), ("abc", "abcd", 3), ("xbc", "abc", 0)],
+)
+def test_get_common_prefix(a: str, b: str, expected: int):
+    assert get_common_prefix(a, b) == expected
+
+
+def test_get_common_prefix_size():
+    assert get_common_prefix("abcd", "abcd", 2) == 2
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [("<!-- a -->", True), ("<!---->", True), ("<!-->", False), ("a", False)],
+)
+def test_is_comment(text: str, *, expected: bool):
+    assert is_comment(text) is expected
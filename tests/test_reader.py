@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+
+import nbformat
+import pytest
+from nbformat import NotebookNode
+from nbstore import Store
+from typing_extensions import override
+
+from nbsync.reader import Reader
+
+# pyright: reportUnknownMemberType=false
+
+
+def write(path: Path, *sources: str) -> None:
+    nb = nbformat.v4.new_notebook()
+    for source in sources:
+        nb.cells.append(nbformat.v4.new_code_cell(source))
+    nbformat.write(nb, path)
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> Store:
+    write(tmp_path / "a.ipynb", "a")
+    write(tmp_path / "b.ipynb", "b")
+    return Store(tmp_path)
+
+
+def test_read(store: Store):
+    reader = Reader(store)
+    nb = reader.read("a.ipynb")
+    assert nb.cells[0].source == "a"
+    assert reader.read("a.ipynb") is nb
+    assert store.nodes[store.find_path("a.ipynb")] is nb
+    assert reader.nbytes == store.find_path("a.ipynb").stat().st_size
+
+
+def test_read_store_override(store: Store):
+    class CustomStore(Store):
+        @override
+        def read(self, url: str) -> NotebookNode:
+            nb = super().read(url)
+            nb.metadata["custom"] = True
+            return nb
+
+    reader = Reader(CustomStore(store.src_dirs))
+    assert reader.read("a.ipynb").metadata["custom"]
+
+
+def test_read_modified_size(store: Store):
+    reader = Reader(store)
+    nb = reader.read("a.ipynb")
+    path = store.find_path("a.ipynb")
+    stat = path.stat()
+    write(path, "abc")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    x = reader.read("a.ipynb")
+    assert x is not nb
+    assert x.cells[0].source == "abc"
+    assert len(reader.entries) == 1
+    assert reader.nbytes == path.stat().st_size
+
+
+def test_read_modified_mtime(store: Store):
+    reader = Reader(store)
+    nb = reader.read("a.ipynb")
+    path = store.find_path("a.ipynb")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert reader.read("a.ipynb") is not nb
+
+
+def test_read_evict(store: Store):
+    size = store.find_path("a.ipynb").stat().st_size
+    reader = Reader(store, max_bytes=size + 1)
+    a = reader.read("a.ipynb")
+    reader.read("b.ipynb")
+    assert list(reader.entries) == [store.find_path("b.ipynb")]
+    assert list(store.nodes) == [store.find_path("b.ipynb")]
+    assert reader.nbytes == store.find_path("b.ipynb").stat().st_size
+    assert reader.read("a.ipynb") is not a
+
+
+def test_read_keep_last(store: Store):
+    reader = Reader(store, max_bytes=0)
+    nb = reader.read("a.ipynb")
+    assert reader.read("a.ipynb") is nb
+
+
+def test_read_not_found(store: Store):
+    reader = Reader(store)
+    with pytest.raises(ValueError, match="not found"):
+        reader.read("c.ipynb")
@@ -17,8 +17,11 @@ from nbsync.sync import (
     convert_image,
     update_notebooks,
 )
+from nbsync.trace import Recorder
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from nbsync.notebook import Notebook
 
 # pyright: reportUnknownMemberType=false
@@ -167,3 +170,575 @@ def test_sync_notebook_not_found():
 def test_convert_no_id():
     image = Image("abc", ".", [], {}, "", "a.ipynb")
     assert convert(image, {}) == ""
+
+
+def test_sync_cache(store: Store, tmp_path: Path, caplog: pytest.LogCaptureFixture):
+    import logging
+
+    from nbsync.cache import Cache
+
+    caplog.set_level(logging.INFO, logger="nbsync")
+    text = '```python exec="1"\nprint(3)\n```'
+
+    sync = Synchronizer(store, cache=Cache(tmp_path))
+    x = next(sync.convert(text, "a.md"))
+    assert isinstance(x, Cell)
+    assert x.content == "3\n"
+    assert "'a.md' executed in" in caplog.text
+
+    sync = Synchronizer(store, cache=Cache(tmp_path))
+    x = next(sync.convert(text, "a.md"))
+    assert isinstance(x, Cell)
+    assert x.content == "3\n"
+    assert "'a.md' restored from cache" in caplog.text
+
+
+def test_sync_markdown_pages(store: Store):
+    recorder = Recorder()
+    sync = Synchronizer(store, tracer=recorder)
+    texts = {f"{k}.md": f'```python exec="1"\nprint({k!r})\n```' for k in "ab"}
+    for src_uri in ["a.md", "b.md", "a.md", "b.md"]:
+        x = next(sync.convert(texts[src_uri], src_uri))
+        assert isinstance(x, Cell)
+        assert x.content == f"{src_uri[0]}\n"
+    assert recorder.counters["notebook.executed"] == 2
+
+
+@pytest.fixture
+def store_parallel(tmp_path_factory: pytest.TempPathFactory) -> Store:
+    src_dir = tmp_path_factory.mktemp("parallel")
+    for name, source in [("a", "print(1)"), ("b", "print(2)"), ("c", "1/0")]:
+        nb = nbformat.v4.new_notebook()
+        nb.cells.append(nbformat.v4.new_code_cell(f"# #id\n{source}"))
+        nbformat.write(nb, src_dir.joinpath(f"{name}.ipynb"))
+    return Store(src_dir)
+
+
+def test_sync_workers(store_parallel: Store):
+    sync = Synchronizer(store_parallel, workers=2)
+    text = '![](a.ipynb){#id exec="1"}\n![](b.ipynb){#id exec="1"}'
+    cells = [x for x in sync.convert(text) if isinstance(x, Cell)]
+    assert [cell.content for cell in cells] == ["1\n", "2\n"]
+    assert not sync.notebooks["a.ipynb"].execution_needed
+    assert not sync.notebooks["b.ipynb"].execution_needed
+
+
+def test_sync_workers_error(
+    store_parallel: Store,
+    caplog: pytest.LogCaptureFixture,
+):
+    sync = Synchronizer(store_parallel, workers=2)
+    text = '![](a.ipynb){#id exec="1"}\n![](c.ipynb){#id exec="1"}'
+    with pytest.raises(SystemExit):
+        list(sync.convert(text, "x.md"))
+    assert "Error reading page 'x.md': Error executing notebook" in caplog.text
+    assert "c.ipynb" in caplog.text
+
+
+def test_get_path(sync: Synchronizer):
+    assert sync.get_path(".md", "a.md") == "a.md"
+    assert sync.get_path(".md") == ".md"
+    assert sync.get_path("a.ipynb").endswith("a.ipynb")
+
+
+def test_convert_pages(store_parallel: Store):
+    sync = Synchronizer(store_parallel, workers=2)
+    pages = [
+        ('![](a.ipynb){#id exec="1"}', "a.md"),
+        ('```python exec="1"\nprint(3)\n```', "b.md"),
+        ('![](a.ipynb){#id exec="1"}\n![](b.ipynb){#id exec="1"}', "c.md"),
+        ('```python exec="1"\nprint(4)\n```', "d.md"),
+    ]
+    results = {
+        src_uri: [x.content for x in elems if isinstance(x, Cell)]
+        for src_uri, elems in sync.convert_pages(pages)
+    }
+    assert results == {
+        "a.md": ["1\n"],
+        "b.md": ["3\n"],
+        "c.md": ["1\n", "2\n"],
+        "d.md": ["4\n"],
+    }
+
+
+def test_convert_pages_deduplicate(
+    store_parallel: Store,
+    caplog: pytest.LogCaptureFixture,
+):
+    import logging
+
+    caplog.set_level(logging.INFO, logger="nbsync")
+    sync = Synchronizer(store_parallel)
+    pages = [('![](a.ipynb){#id exec="1"}', f"{k}.md") for k in range(3)]
+    for _, elems in sync.convert_pages(pages):
+        assert list(elems)
+    assert caplog.text.count("executed in") == 1
+
+
+def test_sync_incremental(store: Store):
+    sync = Synchronizer(store, incremental=True)
+    text = '```python exec="1"\nx = [1]\n```\n```python exec="1"\nx.append(2)\nx\n```'
+    cells = [x for x in sync.convert(text, "a.md") if isinstance(x, Cell)]
+    assert cells[-1].content == "[1, 2]"
+    kernel = sync.kernels["a.md"]
+
+    text = text.replace("append(2)", "append(3)")
+    cells = [x for x in sync.convert(text, "a.md") if isinstance(x, Cell)]
+    assert cells[-1].content == "[1, 3]"
+    assert sync.kernels["a.md"] is kernel
+    kernel.shutdown()
+
+
+def test_get_kernel(store: Store):
+    sync = Synchronizer(store)
+    assert sync.get_kernel("a.md") is None
+
+    sync = Synchronizer(store, incremental=True, max_kernels=2)
+    a = sync.get_kernel("a.md")
+    b = sync.get_kernel("b.md")
+    assert sync.get_kernel("a.md") is a
+    sync.get_kernel("c.md")
+    assert list(sync.kernels) == ["b.md", "a.md", "c.md"]
+    sync.trim_kernels()
+    assert list(sync.kernels) == ["a.md", "c.md"]
+    assert sync.get_kernel("b.md") is not b
+
+
+def test_trim_kernels_busy(store: Store):
+    sync = Synchronizer(store, incremental=True, max_kernels=1)
+    sync.get_kernel("a.md")
+    sync.get_kernel("b.md")
+    sync.busy["a.md"] += 1
+    sync.trim_kernels()
+    assert list(sync.kernels) == ["a.md"]
+
+
+def test_sync_incremental_max_kernels(store: Store):
+    sync = Synchronizer(store, incremental=True, max_kernels=1)
+    text = '```python exec="1"\nprint(1)\n```\n\n![](a.ipynb){#id exec="1"}'
+    for _ in range(2):
+        list(sync.convert(text, "a.md"))
+        assert len(sync.kernels) == 1
+    kernel = next(iter(sync.kernels.values()))
+    assert kernel.client is not None
+    kernel.shutdown()
+
+
+def test_sync_kernel_pool(store: Store):
+    from nbsync.kernel import KernelPool
+
+    pool = KernelPool(1, "y = 10")
+    sync = Synchronizer(store, kernel_pool=pool)
+    for k in range(2):
+        text = f'```python exec="1"\nprint(y + {k})\n```'
+        x = next(sync.convert(text, f"{k}.md"))
+        assert isinstance(x, Cell)
+        assert x.content == f"{10 + k}\n"
+        assert len(pool.kernels) == 1
+    pool.shutdown()
+
+
+def test_sync_kernel_pool_timeout(store: Store, caplog: pytest.LogCaptureFixture):
+    from nbsync.kernel import KernelPool
+    from nbsync.limits import Limits
+
+    pool = KernelPool()
+    sync = Synchronizer(store, limits=Limits(timeout=1), kernel_pool=pool)
+    text = '```python exec="1"\nimport time\ntime.sleep(10)\n```'
+    with pytest.raises(SystemExit):
+        list(sync.convert(text, "a.md"))
+    assert "Timed out after 1 seconds" in caplog.text
+    pool.shutdown()
+
+
+def python(source: str) -> str:
+    import shlex
+    import sys
+
+    return f"{shlex.quote(sys.executable)} -c {shlex.quote(source)}"
+
+
+def test_sync_console(store: Store):
+    sync = Synchronizer(store)
+    command = python('print("a  b")')
+    text = f'```console exec="1" source="1"\n$ {command}\n```'
+    x = list(sync.convert(text, "a.md"))
+    assert x == [f"```bash\n$ {command}\na  b\n```"]
+    nb = sync.notebooks[".md"].nb
+    assert "language_info" not in nb.metadata
+
+
+def test_sync_console_mixed(store: Store):
+    sync = Synchronizer(store)
+    command = python('print("a")')
+    text = f'```python exec="1"\nprint(1)\n```\n\n```console exec="1"\n$ {command}\n```'
+    x = list(sync.convert(text, "a.md"))
+    assert x[-1] == "```bash\na\n```"
+    nb = sync.notebooks[".md"].nb
+    assert "language_info" in nb.metadata
+
+
+def test_update_notebooks_console(store: Store):
+    notebooks: dict[str, Notebook] = {}
+    attrs = {"command": "ls", "workdir": "docs"}
+    code_block = CodeBlock("abc", "id", ["console"], attrs, "", ".md")
+    update_notebooks(code_block, notebooks, store)
+    cell = notebooks[".md"].nb.cells[0]
+    assert cell.metadata["nbsync"] == {"console": "ls", "workdir": "docs"}
+
+
+def test_sync_reader(store: Store):
+    sync = Synchronizer(store, max_read_bytes=100)
+    assert sync.reader.store is store
+    assert sync.reader.max_bytes == 100
+    list(sync.convert("![](a.ipynb){#id}"))
+    list(sync.convert("![](a.ipynb){#id}"))
+    assert len(sync.reader.entries) == 1
+
+
+def test_sync_parser(store: Store):
+    sync = Synchronizer(store, max_parse_bytes=100)
+    assert sync.parser.max_bytes == 100
+    x = list(sync.convert('![](a.ipynb){#id exec="1"}'))
+    y = list(sync.convert('![](a.ipynb){#id exec="1"}'))
+    assert len(sync.parser.entries) == 1
+    assert x == y
+
+
+def test_sync_parser_incremental(store: Store):
+    sync = Synchronizer(store, incremental_parse=True)
+    assert sync.parser.incremental
+    list(sync.convert("![](a.ipynb){#id}\n\ntext\n", "a.md"))
+    list(sync.convert("![](a.ipynb){#id}\n\nnew text\n", "a.md"))
+    assert list(sync.parser.pages) == ["a.md"]
+
+
+def test_sync_index(store: Store):
+    sync = Synchronizer(store)
+    list(sync.parse("![](a.ipynb){#id}\n![](b.ipynb){#id}", "a.md"))
+    list(sync.parse('![](a.ipynb){#id}\n```python exec="1"\n1\n```', "b.md"))
+    list(sync.parse("![](b.ipynb){#id}"))
+    assert sync.index.pages == {"a.md": {"a.ipynb", "b.ipynb"}, "b.md": {"a.ipynb"}}
+
+
+def test_sync_dirty_pages(store: Store):
+    sync = Synchronizer(store)
+    list(sync.convert("![](a.ipynb){#id}", "a.md"))
+    list(sync.convert("![](b.ipynb){#id}", "b.md"))
+    path = store.find_path("a.ipynb")
+    assert sync.dirty_pages([path]) == {"a.md"}
+    assert sync.dirty_pages([str(path.with_name("c.ipynb"))]) == set()
+    list(sync.convert("![](b.ipynb){#id}", "a.md"))
+    assert sync.dirty_pages([path]) == set()
+
+
+STREAM_SOURCE = """\
+# Title
+
+![](a.ipynb){#id exec="1" a}
+
+```python exec="1" source="1"
+print(3)
+```
+
+```python exec="1"
+print(4)
+```
+
+```a b.md#c source=1
+c
+```
+"""
+
+
+def test_convert_stream(store: Store):
+    x = [
+        e.convert() if isinstance(e, Cell) else e
+        for e in Synchronizer(store).convert(STREAM_SOURCE)
+    ]
+    y = [
+        e.convert() if isinstance(e, Cell) else e
+        for e in Synchronizer(store).convert_stream(STREAM_SOURCE)
+    ]
+    assert x == y
+    assert "2" in x
+
+
+def test_convert_stream_lazy(store: Store):
+    sync = Synchronizer(store)
+    it = sync.convert_stream(STREAM_SOURCE, "a.md")
+    assert next(it) == "# Title\n\n"
+    assert sync.notebooks["a.ipynb"].execution_needed
+    assert sync.notebooks[".md"].execution_needed
+    x = next(it)
+    assert isinstance(x, Cell)
+    assert x.content == "2\n"
+    assert not sync.notebooks["a.ipynb"].execution_needed
+    assert sync.notebooks[".md"].execution_needed
+    list(it)
+    assert not sync.notebooks[".md"].execution_needed
+    assert not sync.parser.entries
+    assert sync.index.pages == {"a.md": {"a.ipynb", "b.md"}}
+
+
+async def aconvert(sync: Synchronizer, text: str, src_uri: str) -> list[str | Cell]:
+    return [elem async for elem in sync.aconvert(text, src_uri)]
+
+
+def test_aconvert(store_parallel: Store):
+    import asyncio
+
+    sync = Synchronizer(store_parallel)
+
+    async def main() -> list[list[str | Cell]]:
+        results = await asyncio.gather(
+            aconvert(sync, '![](a.ipynb){#id exec="1"}', "a.md"),
+            aconvert(sync, '```python exec="1"\nprint(3)\n```', "b.md"),
+            aconvert(sync, '![](b.ipynb){#id exec="1"}', "c.md"),
+        )
+        return list(results)
+
+    results = asyncio.run(main())
+    contents = [[x.content for x in r if isinstance(x, Cell)] for r in results]
+    assert contents == [["1\n"], ["3\n"], ["2\n"]]
+    assert not sync.tasks
+
+
+def test_aconvert_workers(store: Store, monkeypatch: pytest.MonkeyPatch):
+    import asyncio
+
+    sync = Synchronizer(store, workers=2)
+    running: list[str] = []
+    peak = 0
+
+    async def execute(path: str, *_: object) -> float:
+        nonlocal peak
+        running.append(path)
+        peak = max(peak, len(running))
+        await asyncio.sleep(0.01)
+        running.remove(path)
+        return 0
+
+    monkeypatch.setattr(sync, "aexecute_notebook", execute)
+    texts = [f'```python exec="1"\n{k}\n```' for k in range(5)]
+
+    async def main() -> None:
+        limiter = sync.get_limiter()
+        assert sync.get_limiter() is limiter
+        await asyncio.gather(
+            *(aconvert(sync, text, f"{k}.md") for k, text in enumerate(texts)),
+        )
+
+    asyncio.run(main())
+    assert peak == 2
+
+
+def test_aconvert_deduplicate(
+    store_parallel: Store,
+    caplog: pytest.LogCaptureFixture,
+):
+    import asyncio
+    import logging
+
+    caplog.set_level(logging.INFO, logger="nbsync")
+    sync = Synchronizer(store_parallel)
+    text = '![](a.ipynb){#id exec="1"}'
+
+    async def main() -> list[list[str | Cell]]:
+        return await asyncio.gather(
+            *(aconvert(sync, text, f"{k}.md") for k in range(3)),
+        )
+
+    for elems in asyncio.run(main()):
+        assert [x.content for x in elems if isinstance(x, Cell)] == ["1\n"]
+    assert caplog.text.count("executed in") == 1
+
+
+def test_aconvert_console(store: Store):
+    import asyncio
+
+    sync = Synchronizer(store)
+    command = python('print("a  b")')
+    text = f'```console exec="1" source="1"\n$ {command}\n```'
+    x = asyncio.run(aconvert(sync, text, "a.md"))
+    assert x == [f"```bash\n$ {command}\na  b\n```"]
+
+
+def test_aexecute_error(store_parallel: Store, caplog: pytest.LogCaptureFixture):
+    import asyncio
+
+    sync = Synchronizer(store_parallel, workers=2)
+    list(sync.parse('![](a.ipynb){#id exec="1"}\n![](c.ipynb){#id exec="1"}'))
+    with pytest.raises(SystemExit):
+        asyncio.run(sync.aexecute("x.md"))
+    assert "Error reading page 'x.md': Error executing notebook" in caplog.text
+    assert "c.ipynb" in caplog.text
+    assert not sync.notebooks["a.ipynb"].execution_needed
+
+
+def test_aexecute_kernel_pool(store: Store):
+    import asyncio
+
+    from nbsync.kernel import KernelPool
+
+    pool = KernelPool()
+    sync = Synchronizer(store, kernel_pool=pool)
+    text = '```python exec="1"\nprint(5)\n```'
+    x = asyncio.run(aconvert(sync, text, "a.md"))
+    assert isinstance(x[0], Cell)
+    assert x[0].content == "5\n"
+    assert len(pool.kernels) == 1
+    pool.shutdown()
+
+
+def test_sync_timing(store: Store, tmp_path: Path):
+    from nbsync.cache import Cache
+    from nbsync.timing import TimingReport
+
+    timing = TimingReport()
+    sync = Synchronizer(store, cache=Cache(tmp_path), timing=timing)
+    text = '```python exec="1"\nprint(1)\n```\n![](a.ipynb){#id exec="1"}'
+    list(sync.convert(text, "a.md"))
+    paths = [x.path for x in timing.notebooks]
+    assert "a.md" in paths
+    assert len(paths) == 2
+    assert all(x.cells == 1 for x in timing.notebooks)
+    assert {x.identifier for x in timing.cells} == {"id", "image-nbsync-0"}
+
+    timing.clear()
+    sync = Synchronizer(store, cache=Cache(tmp_path), timing=timing)
+    list(sync.convert(text, "a.md"))
+    assert not timing.notebooks
+
+
+def test_sync_timing_default(store: Store):
+    sync = Synchronizer(store)
+    list(sync.convert('![](a.ipynb){#id exec="1"}', "a.md"))
+    assert sync.timing is None
+
+
+def test_sync_output_bytes_noop(store: Store, monkeypatch: pytest.MonkeyPatch):
+    cells: list[NotebookNode] = []
+
+    def get_output_bytes(cell: NotebookNode) -> int:
+        cells.append(cell)
+        return 0
+
+    monkeypatch.setattr("nbsync.notebook.get_output_bytes", get_output_bytes)
+    sync = Synchronizer(store)
+    list(sync.convert('```python exec="1"\nprint(1)\n```', "a.md"))
+    assert sync.notebooks[".md"].executed
+    assert not cells
+    assert sync.notebooks[".md"].output_bytes == 0
+    assert cells
+
+
+def test_sync_tracer(store: Store, tmp_path: Path):
+    from nbsync.cache import Cache
+
+    recorder = Recorder()
+    store = Store(store.src_dirs)
+    sync = Synchronizer(store, cache=Cache(tmp_path), tracer=recorder)
+    text = '```python exec="1"\nprint(1)\n```\n![](a.ipynb){#id exec="1"}'
+    list(sync.convert(text, "a.md"))
+    durations = recorder.durations()
+    assert set(durations) == {"parse", "read", "execute", "convert"}
+    assert recorder.counters["notebook.executed"] == 2
+    assert recorder.counters["output.bytes"] > 0
+
+    list(sync.convert(text, "a.md"))
+    assert recorder.counters["read.hit"] == 1
+
+    sync = Synchronizer(store, cache=Cache(tmp_path), tracer=recorder)
+    list(sync.convert(text, "a.md"))
+    assert recorder.counters["cache.hit"] == 2
+
+
+def test_sync_assets(store: Store, tmp_path: Path):
+    from nbsync.asset import Asset, AssetStore
+
+    sync = Synchronizer(store, assets=AssetStore(tmp_path))
+    text = '```python exec="1"\nimport matplotlib.pyplot as plt\nplt.plot([1])\n```'
+    cells = [x for x in sync.convert(text, "a.md") if isinstance(x, Cell)]
+    assert isinstance(cells[0].content, Asset)
+    assert cells[0].mime == "image/png"
+    content = cells[0].read_content()
+    assert isinstance(content, bytes)
+    assert content.startswith(b"\x89PNG")
+    assert cells[0].convert().startswith(f"![]({cells[0].content.name})")
+
+
+def test_convert_image_spilled_pdf(tmp_path: Path):
+    import base64
+
+    from nbsync.asset import Asset, AssetStore
+
+    pdf = base64.b64encode(b"%PDF").decode()
+    data = {"application/pdf": pdf, "text/plain": "<Figure>"}
+    cell = nbformat.v4.new_code_cell("# #fig\nplot()")
+    cell.outputs.append(nbformat.v4.new_output("display_data", data=data))
+    nb = nbformat.v4.new_notebook(cells=[cell])
+    AssetStore(tmp_path).spill(nb)
+    cell = convert_image(Image("", "fig", [], {}, "", "a.ipynb"), nb)
+    assert cell.mime == "application/pdf"
+    assert isinstance(cell.content, Asset)
+    assert cell.read_content() == b"%PDF"
+
+
+def test_sync_timeout(store: Store, caplog: pytest.LogCaptureFixture):
+    sync = Synchronizer(store)
+    text = '```python exec="1" timeout="1"\nimport time\ntime.sleep(10)\n```'
+    with pytest.raises(SystemExit):
+        list(sync.convert(text, "a.md"))
+    assert "Error executing notebook 'a.md'" in caplog.text
+    assert "Timed out after 1.0 seconds in cell 'image-nbsync-0'" in caplog.text
+
+
+def test_update_notebooks_timeout(store: Store):
+    notebooks: dict[str, Notebook] = {}
+    for timeout in ["2.5", "x"]:
+        code_block = CodeBlock("", "id", [], {"timeout": timeout}, "a", ".md")
+        update_notebooks(code_block, notebooks, store)
+    cells = notebooks[".md"].nb.cells
+    assert cells[0].metadata["nbsync"] == {"timeout": 2.5}
+    assert "nbsync" not in cells[1].metadata
+
+
+def test_sync_timeout_changed(store: Store):
+    sync = Synchronizer(store)
+    text = '```python exec="1" timeout="1"\nprint(1)\n```'
+    list(sync.parse(text, "a.md"))
+    list(sync.parse(text.replace('"1"\n', '"30"\n'), "a.md"))
+    cell = sync.notebooks[".md"].nb.cells[0]
+    assert cell.metadata["nbsync"] == {"timeout": 30.0}
+
+
+@pytest.fixture
+def store_ab(tmp_path: Path) -> Store:
+    for name in "ab":
+        nb = nbformat.v4.new_notebook()
+        nb.cells.append(nbformat.v4.new_code_cell(f"# #id\nprint('{name}')"))
+        nbformat.write(nb, tmp_path / f"{name}.ipynb")
+    return Store(tmp_path)
+
+
+def test_sync_evict(store_ab: Store):
+    recorder = Recorder()
+    sync = Synchronizer(store_ab, max_notebooks=1, tracer=recorder)
+    list(sync.convert("![](a.ipynb){#id}", "a.md"))
+    list(sync.convert("![](b.ipynb){#id}", "b.md"))
+    assert list(sync.notebooks) == ["a.ipynb", "b.ipynb"]
+    list(sync.convert("![](b.ipynb){#id}", "b.md"))
+    assert list(sync.notebooks) == ["b.ipynb"]
+    assert recorder.counters["notebook.evicted"] == 1
+    assert "a.ipynb" in sync.notebooks.evicted
+
+
+def test_sync_evict_executed(store_ab: Store):
+    recorder = Recorder()
+    sync = Synchronizer(store_ab, max_notebooks=0, tracer=recorder)
+    list(sync.convert('![](a.ipynb){#id exec="1"}', "a.md"))
+    assert recorder.counters["notebook.executed"] == 1
+    x = list(sync.convert("![](a.ipynb){#id}", "b.md"))
+    assert recorder.counters["notebook.executed"] == 2
+    assert "'a'" in str(x[0])
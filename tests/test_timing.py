@@ -0,0 +1,96 @@
+import json
+
+import nbformat
+import nbstore.notebook
+import pytest
+from nbformat import NotebookNode
+
+from nbsync.notebook import Notebook
+from nbsync.timing import (
+    CellTiming,
+    TimingReport,
+    format_bytes,
+    get_cell_timings,
+    parse_timestamp,
+)
+
+# pyright: reportUnknownMemberType=false
+
+
+@pytest.fixture(scope="module")
+def nb() -> NotebookNode:
+    nb = nbformat.v4.new_notebook()
+    for source in ["# #sleep\nimport time\ntime.sleep(0.2)", "print(1)"]:
+        nb.cells.append(nbformat.v4.new_code_cell(source))
+    nb.cells.append(nbformat.v4.new_markdown_cell("text"))
+    nbstore.notebook.execute(nb)
+    return nb
+
+
+def test_get_cell_timings(nb: NotebookNode):
+    timings = get_cell_timings(nb, "a.md")
+    assert len(timings) == 2
+    x, y = timings
+    assert x.path == "a.md"
+    assert x.index == 0
+    assert x.identifier == "sleep"
+    assert x.wall >= 0.2
+    assert x.queue >= 0
+    assert y.identifier == ""
+    assert y.output_bytes > x.output_bytes
+
+
+def test_get_cell_timings_invalid():
+    cell = nbformat.v4.new_code_cell("print(1)")
+    cell.metadata["execution"] = {"iopub.status.busy": "x"}
+    nb = nbformat.v4.new_notebook(cells=[cell])
+    assert get_cell_timings(nb, "a.md") == []
+
+
+def test_parse_timestamp():
+    x = parse_timestamp("2025-01-01T00:00:01.500000Z")
+    assert x - parse_timestamp("2025-01-01T00:00:00Z") == 1.5
+
+
+@pytest.mark.parametrize(
+    ("size", "expected"),
+    [(10, "10 B"), (2048, "2.0 kB"), (3 * 2**20, "3.0 MB")],
+)
+def test_format_bytes(size: int, expected: str):
+    assert format_bytes(size) == expected
+
+
+def test_report(nb: NotebookNode):
+    report = TimingReport()
+    report.add("a.md", nb, 1.5)
+    report.add("b.ipynb", nbformat.v4.new_notebook(), 0.5)
+    assert [x.cells for x in report.notebooks] == [2, 0]
+
+    data = json.loads(report.to_json())
+    assert data["notebooks"][0] == {"path": "a.md", "elapsed": 1.5, "cells": 2}
+    assert data["cells"][0]["identifier"] == "sleep"
+
+    report.clear()
+    assert not report.notebooks
+    assert not report.cells
+
+
+def test_summary():
+    report = TimingReport()
+    report.cells = [
+        CellTiming("a.md", 0, "fast", 0.1, 0.001, 10),
+        CellTiming("b.md", 3, "", 2.5, 0.002, 2048),
+    ]
+    lines = report.summary(limit=1).splitlines()
+    assert lines[0] == "Slowest notebooks (0 executed):"
+    assert lines[1] == "Slowest cells (2 executed):"
+    assert lines[2] == "      2.50s  b.md [3] (queue 0.002s, 2.0 kB)"
+    assert len(lines) == 3
+
+
+def test_materialize_drops_timings(nb: NotebookNode):
+    notebook = Notebook(nb)
+    notebook.add_cell("id", "print(2)")
+    notebook.materialize()
+    assert get_cell_timings(notebook.nb, "a.md") == []
+    assert get_cell_timings(nb, "a.md")
@@ -0,0 +1,27 @@
+import pytest
+
+from nbsync.trace import NOOP, Recorder
+
+
+def test_noop():
+    with NOOP.span("parse", url="a.ipynb"):
+        pass
+    NOOP.count("cache.hit")
+    assert not NOOP.enabled
+
+
+def test_recorder():
+    recorder = Recorder()
+    assert recorder.enabled
+    with recorder.span("execute", path="a.md"):
+        pass
+    with pytest.raises(ZeroDivisionError), recorder.span("execute", path="b.md"):
+        _ = 1 / 0
+    recorder.count("output.bytes", 10, path="a.md")
+    recorder.count("output.bytes", 5)
+    assert [x.attributes for x in recorder.spans] == [
+        {"path": "a.md"},
+        {"path": "b.md"},
+    ]
+    assert recorder.counters == {"output.bytes": 15}
+    assert list(recorder.durations()) == ["execute"]
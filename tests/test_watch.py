@@ -0,0 +1,158 @@
+import os
+import time
+from pathlib import Path
+
+import nbformat
+import pytest
+from nbstore import Store
+
+from nbsync.sync import Synchronizer
+from nbsync.trace import Recorder
+from nbsync.watch import Watcher, get_stat, read_text
+
+# pyright: reportUnknownMemberType=false
+
+
+def write(path: Path, source: str) -> None:
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_code_cell(f"# #id\n{source}"))
+    nbformat.write(nb, path)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> Store:
+    write(tmp_path / "a.ipynb", "print(1)")
+    return Store(tmp_path)
+
+
+@pytest.fixture
+def watcher(store: Store) -> Watcher:
+    return Watcher(Synchronizer(store))
+
+
+def test_convert(watcher: Watcher, store: Store):
+    watcher.convert("![](a.ipynb){#id}", "a.md")
+    assert watcher.texts == {"a.md": "![](a.ipynb){#id}"}
+    assert store.find_path("a.ipynb") in watcher.stats
+
+
+def test_scan(watcher: Watcher, store: Store):
+    watcher.convert("![](a.ipynb){#id}", "a.md")
+    assert watcher.scan() == []
+    path = store.find_path("a.ipynb")
+    write(path, "print(2)")
+    assert watcher.scan() == [path]
+    assert watcher.scan() == []
+
+
+def test_scan_new_file(watcher: Watcher, store: Store):
+    watcher.convert("![](b.ipynb){#id}", "a.md")
+    assert watcher.scan() == []
+    path = store.src_dirs[0] / "b.ipynb"
+    write(path, "print(2)")
+    assert watcher.scan() == [path.absolute()]
+
+
+def test_poll(watcher: Watcher, store: Store):
+    assert watcher.poll() == set()
+    watcher.convert("![](a.ipynb){#id}", "a.md")
+    watcher.convert("text", "b.md")
+    write(store.find_path("a.ipynb"), "print(2)")
+    assert watcher.poll() == {"a.md"}
+    nb = watcher.sync.notebooks["a.ipynb"].nb
+    assert nb.cells[0].source == "# #id\nprint(2)"
+
+
+def test_poll_unknown_page(watcher: Watcher, store: Store):
+    list(watcher.sync.convert("![](a.ipynb){#id}", "b.md"))
+    watcher.convert("![](a.ipynb){#id}", "a.md")
+    write(store.find_path("a.ipynb"), "print(2)")
+    assert watcher.poll() == {"a.md"}
+
+
+def test_poll_execute(store: Store):
+    recorder = Recorder()
+    watcher = Watcher(Synchronizer(store, tracer=recorder))
+    text = '![](a.ipynb){#id exec="1"}'
+    watcher.convert(text, "a.md")
+    assert recorder.counters["notebook.executed"] == 1
+    write(store.find_path("a.ipynb"), "print(2)")
+    watcher.poll()
+    assert recorder.counters["notebook.executed"] == 2
+    assert not watcher.sync.notebooks["a.ipynb"].execution_needed
+    cells = watcher.convert(text, "a.md")
+    assert recorder.counters["notebook.executed"] == 2
+    assert "2" in str(cells[0])
+
+
+def test_poll_markdown(store: Store, tmp_path: Path):
+    recorder = Recorder()
+    watcher = Watcher(Synchronizer(store, tracer=recorder), docs_dir=tmp_path)
+    texts = {f"{k}.md": f'```python exec="1"\nprint({k!r})\n```' for k in "ab"}
+    for src_uri, text in texts.items():
+        tmp_path.joinpath(src_uri).write_text(text, encoding="utf-8")
+        watcher.convert(text, src_uri)
+    assert recorder.counters["notebook.executed"] == 2
+    texts["a.md"] = texts["a.md"].replace("'a'", "'c'")
+    path = tmp_path / "a.md"
+    path.write_text(texts["a.md"], encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert watcher.poll() == {"a.md"}
+    assert recorder.counters["notebook.executed"] == 3
+    watcher.convert(texts["b.md"], "b.md")
+    cells = watcher.convert(texts["a.md"], "a.md")
+    assert recorder.counters["notebook.executed"] == 3
+    assert "c" in str(cells[0])
+
+
+def test_poll_docs_dir(store: Store, tmp_path: Path):
+    watcher = Watcher(Synchronizer(store), docs_dir=tmp_path)
+    path = tmp_path / "a.md"
+    path.write_text("![](a.ipynb){#id}", encoding="utf-8")
+    watcher.convert("![](a.ipynb){#id}", "a.md")
+    path.write_text("![](a.ipynb){#id}\n\nnew", encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert watcher.poll() == {"a.md"}
+    assert watcher.texts["a.md"].endswith("new")
+
+
+def test_poll_error(watcher: Watcher, store: Store, monkeypatch: pytest.MonkeyPatch):
+    watcher.convert("![](a.ipynb){#id}", "a.md")
+
+    def prepare(_: object) -> None:
+        raise SystemExit(1)
+
+    monkeypatch.setattr(watcher.sync, "prepare", prepare)
+    write(store.find_path("a.ipynb"), "print(2)")
+    assert watcher.poll() == {"a.md"}
+
+
+def test_start_stop(watcher: Watcher, store: Store):
+    watcher.interval = 0.01
+    watcher.convert("![](a.ipynb){#id}", "a.md")
+    watcher.start()
+    watcher.start()
+    write(store.find_path("a.ipynb"), "print(2)")
+    nb = watcher.sync.notebooks["a.ipynb"].nb
+
+    for _ in range(500):
+        nb = watcher.sync.notebooks["a.ipynb"].nb
+        if nb.cells[0].source.endswith("print(2)"):
+            break
+        time.sleep(0.01)
+
+    watcher.stop()
+    watcher.stop()
+    assert nb.cells[0].source.endswith("print(2)")
+
+
+def test_get_stat(tmp_path: Path):
+    assert get_stat(tmp_path / "a") is None
+
+
+def test_read_text(tmp_path: Path):
+    assert read_text(tmp_path / "a") is None